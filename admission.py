@@ -0,0 +1,106 @@
+import os
+import shutil
+import threading
+
+from progressive import output_size
+
+# ======== Disk-Space Admission ========
+#
+# Before a job launches, its output size is estimated and reserved against
+# the free space of the target filesystem. Outstanding reservations shrink as
+# running outputs grow, so free space already promised to a running job is
+# never promised twice. Jobs that don't fit wait until space frees up instead
+# of failing late with a half-written file.
+
+# Safety margin on top of the estimate (VBR overshoot, container overhead)
+ESTIMATE_MARGIN = 0.10
+# Free space always left untouched on the target filesystem
+HEADROOM_BYTES = 1 << 30
+RECHECK_SECONDS = 5.0
+
+def estimate_output_bytes(duration, video_bps, audio_bps, input_size=0):
+    """Estimates output size from bitrate and duration, or input size if duration is unknown."""
+    if duration > 0:
+        estimate = (video_bps + audio_bps) * duration / 8
+    else:
+        estimate = input_size
+    return int(estimate * (1 + ESTIMATE_MARGIN))
+
+class SpaceReservations:
+    def __init__(self, headroom=HEADROOM_BYTES):
+        self.headroom = headroom
+        # job -> {"device", "folder", "output_path", "bytes"}
+        self.reservations = {}
+        # Bumped on every reserve/release, so a free-space check made outside
+        # the lock can tell whether the reservations changed under it
+        self.version = 0
+        # Bumped by cancel_waiting(); waiters from an older generation give up
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def outstanding(self, reservations):
+        """Bytes reserved that the given running outputs haven't written yet."""
+        return sum(max(reservation["bytes"] - output_size(reservation["output_path"]), 0) for reservation in reservations)
+
+    def reserve(self, job, output_path, estimate, stop_event, on_wait=None):
+        """Blocks until estimate bytes fit on output_path's filesystem, then reserves them.
+
+        Returns False if stop_event was set or cancel_waiting() was called
+        while waiting. Raises ValueError if the estimate can never fit on that
+        filesystem. on_wait(free_bytes) is called once when the job first has
+        to wait.
+        """
+        folder = os.path.dirname(os.path.abspath(output_path))
+        device = os.stat(folder).st_dev
+        total = shutil.disk_usage(folder).total
+        if estimate + self.headroom > total:
+            raise ValueError(f"estimated output of {estimate / 1e9:.1f} GB cannot fit on {folder}")
+        with self.condition:
+            generation = self.generation
+        waited = False
+        while not stop_event.is_set():
+            with self.condition:
+                if self.generation != generation:
+                    return False
+                version = self.version
+                reservations = [reservation for reservation in self.reservations.values() if reservation["device"] == device]
+            # Filesystem calls stay outside the lock: a slow share must not
+            # hold up release() for every other job
+            available = shutil.disk_usage(folder).free - self.outstanding(reservations) - self.headroom
+            with self.condition:
+                if self.generation != generation:
+                    return False
+                if self.version != version:
+                    # Another job reserved or released meanwhile; check again
+                    continue
+                if estimate <= available:
+                    self.reservations[job] = {
+                        "device": device, "folder": folder, "output_path": output_path, "bytes": estimate
+                    }
+                    self.version += 1
+                    return True
+                if not waited and on_wait:
+                    on_wait(max(available, 0))
+                waited = True
+                self.condition.wait(RECHECK_SECONDS)
+        return False
+
+    def cancel_waiting(self):
+        """Makes every reserve() call currently waiting return False (Stop button)."""
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def usage(self, job):
+        """Returns (reserved_bytes, written_bytes) for a running job."""
+        with self.condition:
+            reservation = self.reservations.get(job)
+        if reservation is None:
+            return 0, 0
+        return reservation["bytes"], output_size(reservation["output_path"])
+
+    def release(self, job):
+        with self.condition:
+            if self.reservations.pop(job, None) is not None:
+                self.version += 1
+            self.condition.notify_all()
@@ -0,0 +1,68 @@
+from profiles import get_video_args, fit_scale
+from frame_path import DEFAULT_BACKEND, build_frame_path
+from progressive import DEFAULT_OUTPUT_MODE, muxer_args
+from rate_control import override_video_args
+
+# ======== FFmpeg Command Assembly ========
+#
+# Turns a queued job's settings, compiled profile and input probe into the
+# ffmpeg argument list. Kept free of Tk so the commands can be checked by the
+# tests and driven by the simulator.
+
+def get_scale(profile, settings, probe):
+    # An explicit "Force scale" wins over the profile's own target size, which
+    # is a bounding box: aspect ratio kept, never upscaled
+    if settings["downscale"]:
+        return settings["scale"]
+    return fit_scale(profile["scale"], probe[0], probe[1])
+
+def plan_frame_path(app, settings, probe):
+    profile = app.profiles[settings["profile"]]
+    _, _, input_codec, input_pix_fmt = probe
+    return build_frame_path(settings.get("backend", DEFAULT_BACKEND), app.capabilities, app.codec_support,
+                            input_codec, input_pix_fmt, get_scale(profile, settings, probe))
+
+def build_ffmpeg_command(app, file_path, output_path, settings, probe, video_overrides=None):
+    """Builds the FFmpeg command from the job's compiled profile and queued settings.
+
+    app needs profiles, capabilities and codec_support; probe is the input's
+    (width, height, codec, pix_fmt).
+    """
+    profile = app.profiles[settings["profile"]]
+    input_codec = probe[2]
+    audio_codec = settings["audio_codec"]
+    frame_path = plan_frame_path(app, settings, probe)
+
+    # -n: never overwrite; remux_video refuses existing outputs up front
+    command = ["ffmpeg", "-n", *frame_path["input_args"], "-thread_queue_size", "1024", "-i", file_path]
+
+    # Video Encoding Settings (precompiled per codec from the profile)
+    video_args = get_video_args(profile, frame_path["encoder"], app.codec_support)
+    if video_overrides:
+        video_args = override_video_args(video_args, video_overrides)
+    command.extend(video_args)
+
+    # Audio Settings
+    command.extend([
+        "-c:a", "copy" if input_codec == "aac" and audio_codec == "aac" else audio_codec,
+        "-b:a", f"{settings['audio_bitrate']}k",
+        "-ar", str(settings["audio_sample_rate"]),
+        "-ac", str(settings["audio_channels"])
+    ])
+
+    # Output Format and Common Settings
+    command.extend(muxer_args(settings.get("output_mode", DEFAULT_OUTPUT_MODE), settings["output_format"], output_path))
+    command.extend(frame_path["pix_fmt_args"])
+    command.extend([
+        "-map_metadata", "0",
+        # Map only video and audio streams, excluding timecode
+        "-map", "0:v",
+        "-map", "0:a"
+    ])
+
+    # Scale/format conversion stage of the frame path (GPU or CPU)
+    if frame_path["filter"]:
+        command.extend(["-vf", frame_path["filter"]])
+
+    command.append(output_path)
+    return command
@@ -0,0 +1,139 @@
+import subprocess
+
+# ======== Hardware Frame Path ========
+#
+# A job's frames go through three stages: decode, scale/format conversion and
+# encode. On the CUDA backend the ideal path keeps frames on the GPU the whole
+# way (NVDEC -> scale_cuda -> NVENC). Each stage falls back on its own when the
+# input codec, the ffmpeg build or the GPU can't do it:
+#   decode on CPU  -> frames are uploaded once (hwupload_cuda) before scaling
+#   no scale_cuda  -> frames come back to system memory, scaled on the CPU and
+#                     handed to NVENC, which uploads them itself
+#   no NVENC       -> the whole job runs on the software path (libx264/libx265)
+
+BACKENDS = ("auto", "cuda", "software")
+DEFAULT_BACKEND = "auto"
+
+# Input codec -> pixel formats NVDEC decodes on current NVIDIA GPUs. Only
+# 4:2:0 is supported across generations; 4:2:2/4:4:4 and 10-bit H.264 make
+# -hwaccel cuda fall back to software frames, which a scale_cuda chain can't
+# take, so those inputs are decoded on the CPU and uploaded instead
+NVDEC_PIX_FMTS = {
+    "h264": {"yuv420p", "yuvj420p"},
+    "hevc": {"yuv420p", "yuvj420p", "yuv420p10le", "yuv420p12le"},
+    "av1": {"yuv420p", "yuv420p10le"},
+    "vp8": {"yuv420p"},
+    "vp9": {"yuv420p", "yuv420p10le", "yuv420p12le"},
+    "mpeg1video": {"yuv420p"},
+    "mpeg2video": {"yuv420p"},
+    "mpeg4": {"yuv420p"},
+    "vc1": {"yuv420p"},
+}
+NVENC_ENCODERS = {"hevc": "hevc_nvenc", "h264": "h264_nvenc"}
+
+def _ffmpeg_list(flag):
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", flag], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return result.stdout.decode(errors="replace")
+    except OSError:
+        return ""
+
+def detect_capabilities():
+    """Returns the hwaccels, filters and encoders this ffmpeg build offers."""
+    hwaccels = {line.strip() for line in _ffmpeg_list("-hwaccels").splitlines()[1:] if line.strip()}
+    filters = {line.split()[1] for line in _ffmpeg_list("-filters").splitlines() if len(line.split()) > 2}
+    encoders = {line.split()[1] for line in _ffmpeg_list("-encoders").splitlines() if len(line.split()) > 2}
+    return {"hwaccels": hwaccels, "filters": filters, "encoders": encoders}
+
+def resolve_backend(backend, capabilities, codec):
+    """Picks "cuda" or "software" for a job; "auto" uses CUDA when NVENC exists."""
+    if backend == "software":
+        return "software"
+    if NVENC_ENCODERS[codec] in capabilities["encoders"]:
+        return "cuda"
+    return "software"
+
+def nvdec_supported(input_codec, input_pix_fmt):
+    return input_pix_fmt in NVDEC_PIX_FMTS.get(input_codec, ())
+
+def build_frame_path(backend, capabilities, codec, input_codec, input_pix_fmt, scale):
+    """Plans decode, scale and encode stages for one job.
+
+    Returns a dict with the input options ("input_args", placed before -i),
+    the video filter chain ("filter", or None), output pixel format options
+    ("pix_fmt_args"), the encoder family ("encoder": "nvenc" or "software")
+    and the chosen device per stage ("stages"), for the job metrics.
+    """
+    backend = resolve_backend(backend, capabilities, codec)
+    scale_expr = f"{scale[0]}:{scale[1]}" if scale else None
+
+    if backend == "software":
+        filters = [f"scale={scale_expr}"] if scale_expr else []
+        return {
+            "input_args": [],
+            "filter": ",".join(filters) or None,
+            "pix_fmt_args": ["-pix_fmt", "yuv420p"],
+            "encoder": "software",
+            "stages": {"decode": "cpu", "scale": "cpu" if scale_expr else "none", "encode": "cpu"},
+        }
+
+    hw_decode = "cuda" in capabilities["hwaccels"] and nvdec_supported(input_codec, input_pix_fmt)
+    hw_scale = "scale_cuda" in capabilities["filters"]
+    # scale_cuda also converts 10-bit/4:2:2 sources to 8-bit 4:2:0 on the GPU
+    cuda_scale = f"scale_cuda={scale_expr}:format=nv12" if scale_expr else "scale_cuda=format=nv12"
+
+    if hw_decode and hw_scale:
+        # Zero-copy: NVDEC surfaces stay on the GPU through scaling into NVENC
+        return {
+            "input_args": ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-extra_hw_frames", "3"],
+            "filter": cuda_scale,
+            "pix_fmt_args": [],
+            "encoder": "nvenc",
+            "stages": {"decode": "gpu", "scale": "gpu", "encode": "gpu"},
+        }
+    if hw_scale and "hwupload_cuda" in capabilities["filters"]:
+        # CPU decode, one upload, then GPU scale/convert
+        return {
+            "input_args": ["-init_hw_device", "cuda=cu", "-filter_hw_device", "cu"],
+            "filter": f"format=nv12,hwupload_cuda,{cuda_scale}",
+            "pix_fmt_args": [],
+            "encoder": "nvenc",
+            "stages": {"decode": "cpu", "scale": "gpu", "encode": "gpu"},
+        }
+    # No GPU scaler: decoded frames land in system memory (downloaded from
+    # NVDEC if it was used), get scaled on the CPU and NVENC uploads them
+    return {
+        "input_args": ["-hwaccel", "cuda"] if hw_decode else [],
+        "filter": f"scale={scale_expr}" if scale_expr else None,
+        "pix_fmt_args": ["-pix_fmt", "yuv420p"],
+        "encoder": "nvenc",
+        "stages": {"decode": "gpu" if hw_decode else "cpu", "scale": "cpu" if scale_expr else "none", "encode": "gpu"},
+    }
+
+def describe_stages(stages):
+    return " -> ".join(f"{stage}:{device}" for stage, device in stages.items())
+
+# Capability sets for checking frame paths on machines without a GPU (used by
+# tests/test_frame_path.py and simulator.py)
+SIMULATED_CAPABILITIES = {
+    "full-cuda": {
+        "hwaccels": {"cuda"},
+        "filters": {"scale", "scale_cuda", "hwupload_cuda"},
+        "encoders": {"hevc_nvenc", "h264_nvenc", "libx264", "libx265"},
+    },
+    "nvenc-without-scale_cuda": {
+        "hwaccels": {"cuda"},
+        "filters": {"scale"},
+        "encoders": {"hevc_nvenc", "h264_nvenc", "libx264", "libx265"},
+    },
+    "nvenc-without-nvdec": {
+        "hwaccels": set(),
+        "filters": {"scale", "scale_cuda", "hwupload_cuda"},
+        "encoders": {"hevc_nvenc", "h264_nvenc", "libx264", "libx265"},
+    },
+    "cpu-only": {
+        "hwaccels": set(),
+        "filters": {"scale"},
+        "encoders": {"libx264", "libx265"},
+    },
+}
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+
+# ======== Storage-Aware I/O Lanes ========
+#
+# Each job reads its input from one device and writes its output to another
+# (often the same one). Parallel reads on a single spinning volume or NAS
+# share turn sequential streams into seeks, so every device gets a read lane
+# with a concurrency limit. Encoded output is written at a small fraction of
+# the input's read rate, so the write lane of a device defaults to one slot
+# per worker: a shared output folder never serializes the workers. Workers
+# pick the queued job whose lanes are least busy instead of strictly the
+# oldest.
+
+DEFAULT_DEVICE_LIMIT = 1
+# Default write-lane limit; RemuxTool sets it to the worker count
+DEFAULT_WRITE_LIMIT = 2
+
+READ = "read"
+WRITE = "write"
+
+def parse_device_limits(spec):
+    """Parses "/mnt/raid=1;/mnt/nvme=4" into {mount_point: limit}."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in (spec or "").split(";"))):
+        mount, _, limit = entry.rpartition("=")
+        if not mount or not limit.isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid device limit entry: {entry!r}")
+        limits[os.path.normcase(os.path.abspath(mount))] = int(limit)
+    return limits
+
+DEVICE_LIMIT_OVERRIDES = parse_device_limits(os.environ.get("MEDIAREMUX_DEVICE_LIMITS"))
+
+def find_mount_point(path):
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.path.normcase(path)
+
+class DeviceLanes:
+    def __init__(self, default_limit=DEFAULT_DEVICE_LIMIT, overrides=None, write_limit=DEFAULT_WRITE_LIMIT):
+        self.default_limit = default_limit
+        self.write_limit = write_limit
+        self.overrides = DEVICE_LIMIT_OVERRIDES if overrides is None else overrides
+        self.active = {}
+        self.mounts = {}
+        self.device_cache = {}
+        # lane -> Event set when a job takes a lane background work is using
+        self.background = {}
+        self.condition = threading.Condition()
+
+    def resolve_device(self, path):
+        """Returns the st_dev of the filesystem holding path, cached per path.
+
+        The cache is checked before touching the filesystem, so a path is
+        stat()ed once however many times the scheduler looks at its job.
+        """
+        device = self.device_cache.get(path)
+        if device is None:
+            try:
+                device = os.stat(path).st_dev
+                if device not in self.mounts:
+                    self.mounts[device] = find_mount_point(path)
+            except OSError:
+                # Unreachable share: give it its own lane keyed by directory
+                device = os.path.dirname(os.path.abspath(path))
+                self.mounts.setdefault(device, device)
+            self.device_cache[path] = device
+        return device
+
+    def job_lanes(self, input_path, output_folder):
+        """The read lane of the input's device and the write lane of the output's."""
+        return frozenset(((READ, self.resolve_device(input_path)), (WRITE, self.resolve_device(output_folder))))
+
+    def input_lanes(self, path):
+        return frozenset(((READ, self.resolve_device(path)),))
+
+    def limit_for(self, lane):
+        kind, device = lane
+        if kind == WRITE:
+            return self.write_limit
+        return self.overrides.get(self.mounts.get(device), self.default_limit)
+
+    def has_capacity(self, lanes):
+        return all(self.active.get(lane, 0) < self.limit_for(lane) for lane in lanes)
+
+    def load(self, lanes):
+        return sum(self.active.get(lane, 0) / self.limit_for(lane) for lane in lanes)
+
+    def take(self, job_queue, job_lanes, stop_event, timeout=1.0):
+        """Removes and returns the queued job with the least-loaded lanes.
+
+        job_lanes(job) returns the set of lanes a job uses. It may touch the
+        filesystem, so it is called without holding the queue mutex or the
+        lanes' own lock; the GUI thread can keep queuing while a slow share
+        answers. Blocks until some job fits under every lane limit, returning
+        None after timeout or when stop_event is set. The caller must
+        release() the returned lanes and call job_queue.task_done() as with
+        get().
+        """
+        deadline = time.monotonic() + timeout
+        while not stop_event.is_set():
+            with job_queue.mutex:
+                queued = list(job_queue.queue)
+            candidates = [(job, job_lanes(job)) for job in queued]
+            with self.condition:
+                eligible = [(self.load(lanes), index, job, lanes)
+                            for index, (job, lanes) in enumerate(candidates)
+                            if self.has_capacity(lanes)]
+                # Least-loaded lanes first, queue order breaks ties
+                for _, _, job, lanes in sorted(eligible, key=lambda item: item[:2]):
+                    with job_queue.mutex:
+                        try:
+                            # Another worker may have taken it, or the queue was cleared
+                            job_queue.queue.remove(job)
+                        except ValueError:
+                            continue
+                    self._acquire(lanes)
+                    # Background work on these lanes steps aside for the job
+                    for lane in lanes:
+                        if lane in self.background:
+                            self.background[lane].set()
+                    return job, lanes
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(min(remaining, 0.25))
+        return None
+
+    def acquire_idle(self, lanes, stop_event):
+        """Claims lanes for background work while no job is using them.
+
+        Background work doesn't count against lane limits, so it never keeps
+        a job waiting. Instead, the returned Event is set as soon as a job
+        takes one of the lanes, and the work should stop and call
+        release_background(). Returns None if stop_event is set first.
+        """
+        with self.condition:
+            while not stop_event.is_set():
+                if not any(self.active.get(lane) or lane in self.background for lane in lanes):
+                    preempted = threading.Event()
+                    for lane in lanes:
+                        self.background[lane] = preempted
+                    return preempted
+                self.condition.wait(0.25)
+        return None
+
+    def release_background(self, lanes):
+        with self.condition:
+            for lane in lanes:
+                self.background.pop(lane, None)
+            self.condition.notify_all()
+
+    def _acquire(self, lanes):
+        for lane in lanes:
+            self.active[lane] = self.active.get(lane, 0) + 1
+
+    def release(self, lanes):
+        with self.condition:
+            for lane in lanes:
+                self.active[lane] -= 1
+                if not self.active[lane]:
+                    del self.active[lane]
+            self.condition.notify_all()
+
+    def describe(self, lanes):
+        return ", ".join(f"{kind} {self.mounts.get(device, str(device))}" for kind, device in sorted(lanes, key=str))
@@ -0,0 +1,268 @@
+import os
+import json
+import array
+import bisect
+import hashlib
+import threading
+import traceback
+import subprocess
+
+import tracing
+from resources import get_resource_class, launch_ffmpeg
+
+# ======== Keyframe Index ========
+#
+# One pass of ffprobe over the packet headers (no decoding) yields every
+# video keyframe's timestamp and byte offset. They are kept in two parallel
+# arrays and cached on disk next to the file's probe data, keyed by path,
+# size and mtime, so a file is scanned once however often it is queued.
+# Thumbnails are taken at keyframes, where seeking needs no extra decoding.
+# Scanning still reads the whole file, so the indexer runs at background
+# priority, only while no job is reading from the same device, and gives the
+# device up (retrying later) as soon as a job takes it.
+
+CACHE_DIR = os.environ.get("MEDIAREMUX_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "mediaremux"))
+
+INDEX_MAGIC = b"MRKI"
+INDEX_VERSION = 1
+THUMBNAIL_COUNT = 6
+THUMBNAIL_WIDTH = 160
+INDEX_RESOURCE_CLASS = "background"
+
+class KeyframeIndex:
+    def __init__(self, times=None, offsets=None):
+        self.times = times if times is not None else array.array("d")
+        self.offsets = offsets if offsets is not None else array.array("q")
+
+    def __len__(self):
+        return len(self.times)
+
+    def keyframe_before(self, seconds):
+        """Returns (time, byte_offset) of the last keyframe at or before seconds."""
+        if not self.times:
+            return None
+        index = max(bisect.bisect_right(self.times, seconds) - 1, 0)
+        return self.times[index], self.offsets[index]
+
+    def keyframe_after(self, seconds):
+        """Returns (time, byte_offset) of the first keyframe at or after seconds."""
+        index = bisect.bisect_left(self.times, seconds)
+        if index >= len(self.times):
+            return None
+        return self.times[index], self.offsets[index]
+
+    def spread(self, count):
+        """Keyframe times spaced evenly through the file, for thumbnails."""
+        if not self.times:
+            return []
+        step = max(len(self.times) / count, 1)
+        return sorted({self.times[min(int(i * step), len(self.times) - 1)] for i in range(count)})
+
+    def mean_gop_seconds(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (self.times[-1] - self.times[0]) / (len(self.times) - 1)
+
+    def write(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            header = array.array("q", [INDEX_VERSION, len(self.times)])
+            f.write(INDEX_MAGIC)
+            header.tofile(f)
+            self.times.tofile(f)
+            self.offsets.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{path} is not a keyframe index")
+            header = array.array("q")
+            header.fromfile(f, 2)
+            version, count = header
+            if version != INDEX_VERSION:
+                raise ValueError(f"{path} has unsupported index version {version}")
+            times, offsets = array.array("d"), array.array("q")
+            times.fromfile(f, count)
+            offsets.fromfile(f, count)
+        return cls(times, offsets)
+
+class IndexingInterrupted(Exception):
+    """Raised when a job needs the device an input is being indexed from."""
+
+def cache_key(file_path):
+    stat = os.stat(file_path)
+    identity = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode()).hexdigest()
+
+def cache_paths(file_path):
+    """Returns (probe_json, index, thumbnail_dir) cache paths for an input."""
+    base = os.path.join(CACHE_DIR, cache_key(file_path))
+    return base + ".probe.json", base + ".kfi", base + "_thumbs"
+
+def scan_keyframes(file_path, resource_class, interrupt=None):
+    """Reads video packet headers once and returns a KeyframeIndex.
+
+    Stops ffprobe and raises IndexingInterrupted once interrupt is set.
+    """
+    index = KeyframeIndex()
+    process, _ = launch_ffmpeg(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,pos,flags",
+         "-of", "csv=p=0", file_path],
+        # ffprobe has no -filter_threads; it demuxes without decoding anyway
+        dict(resource_class, threads=0),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True
+    )
+    for line in process.stdout:
+        if interrupt is not None and interrupt.is_set():
+            process.kill()
+            process.wait()
+            raise IndexingInterrupted(file_path)
+        fields = line.strip().split(",")
+        if len(fields) < 3 or "K" not in fields[2]:
+            continue
+        try:
+            index.times.append(float(fields[0]))
+            index.offsets.append(int(fields[1]) if fields[1] not in ("", "N/A") else -1)
+        except ValueError:
+            continue
+    process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, "ffprobe")
+    # Some containers store packets out of presentation order; lookups bisect,
+    # so keep the arrays sorted by time
+    if any(a > b for a, b in zip(index.times, index.times[1:])):
+        pairs = sorted(zip(index.times, index.offsets))
+        index = KeyframeIndex(array.array("d", (t for t, _ in pairs)), array.array("q", (o for _, o in pairs)))
+    return index
+
+def load_index(file_path):
+    """Returns the cached KeyframeIndex for an input, or None if not indexed yet."""
+    try:
+        # cache_paths() stats the input, which may have moved or gone offline
+        _, index_path, _ = cache_paths(file_path)
+        return KeyframeIndex.read(index_path)
+    except (OSError, ValueError):
+        return None
+
+def load_probe(file_path):
+    """Returns cached (width, height, codec, pix_fmt) for an input, or None."""
+    try:
+        probe_path, _, _ = cache_paths(file_path)
+        with open(probe_path) as f:
+            probe_data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Caches written before pix_fmt was probed are re-probed by the caller
+    if not probe_data.get("width") or "pix_fmt" not in probe_data:
+        return None
+    return probe_data["width"], probe_data["height"], probe_data["codec"], probe_data["pix_fmt"]
+
+def build_index(file_path, probe=None, resource_class=None, interrupt=None):
+    """Scans an input if it isn't cached yet; returns (index, probe_data).
+
+    probe is the (width, height, codec, pix_fmt) tuple stored alongside the
+    index. The scan runs under resource_class, background by default, and
+    stops early when interrupt is set.
+    """
+    probe_path, index_path, _ = cache_paths(file_path)
+    index = load_index(file_path)
+    if index is not None and os.path.exists(probe_path):
+        with open(probe_path) as f:
+            return index, json.load(f)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with tracing.span("keyframe_scan", "index", file=os.path.basename(file_path)):
+        index = scan_keyframes(file_path, resource_class or get_resource_class(INDEX_RESOURCE_CLASS), interrupt)
+    index.write(index_path)
+    width, height, codec, pix_fmt = probe or (0, 0, "", "")
+    probe_data = {
+        "path": os.path.abspath(file_path),
+        "width": width,
+        "height": height,
+        "codec": codec,
+        "pix_fmt": pix_fmt,
+        "keyframes": len(index),
+        "mean_gop_seconds": index.mean_gop_seconds(),
+    }
+    with open(probe_path, "w") as f:
+        json.dump(probe_data, f)
+    return index, probe_data
+
+def generate_thumbnails(file_path, index, count=THUMBNAIL_COUNT, resource_class=None, interrupt=None):
+    """Writes PNG thumbnails at evenly spread keyframes and returns their paths."""
+    resource_class = resource_class or get_resource_class(INDEX_RESOURCE_CLASS)
+    _, _, thumb_dir = cache_paths(file_path)
+    os.makedirs(thumb_dir, exist_ok=True)
+    thumbnails = []
+    for seconds in index.spread(count):
+        thumb_path = os.path.join(thumb_dir, f"{seconds:012.3f}.png")
+        if not os.path.exists(thumb_path):
+            if interrupt is not None and interrupt.is_set():
+                raise IndexingInterrupted(file_path)
+            # Seeking to a keyframe and decoding only keyframes costs one frame decode
+            process, _ = launch_ffmpeg(
+                ["ffmpeg", "-v", "error", "-y", "-skip_frame", "nokey", "-ss", f"{seconds:.3f}", "-i", file_path,
+                 "-frames:v", "1", "-vf", f"scale={THUMBNAIL_WIDTH}:-2", thumb_path],
+                resource_class,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if process.wait() != 0:
+                continue
+        thumbnails.append(thumb_path)
+    return thumbnails
+
+class BackgroundIndexer:
+    """Indexes queued inputs on a background thread and reports back through a callback.
+
+    lanes is the app's DeviceLanes: a file is only scanned while no job is
+    reading from its device, and is put back in line when a job takes it.
+    """
+    def __init__(self, on_indexed, probe, lanes, stop_event):
+        self.on_indexed = on_indexed
+        self.probe = probe
+        self.lanes = lanes
+        self.stop_event = stop_event
+        self.pending = []
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="keyframe-indexer", daemon=True)
+        self.thread.start()
+
+    def submit(self, file_path):
+        with self.condition:
+            self.pending.append(file_path)
+            self.condition.notify()
+
+    def index(self, file_path):
+        """Returns (index, probe_data, thumbnails), or None if stopped while waiting for the disk."""
+        lanes = self.lanes.input_lanes(file_path)
+        interrupt = self.lanes.acquire_idle(lanes, self.stop_event)
+        if interrupt is None:
+            return None
+        try:
+            index, probe_data = build_index(file_path, self.probe(file_path), interrupt=interrupt)
+            return index, probe_data, generate_thumbnails(file_path, index, interrupt=interrupt)
+        finally:
+            self.lanes.release_background(lanes)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                file_path = self.pending.pop(0)
+            # Any failure is reported for that file only; the thread keeps
+            # serving the rest of the session
+            try:
+                result = self.index(file_path)
+                if result is None:
+                    continue
+                self.on_indexed(file_path, *result, None)
+            except IndexingInterrupted:
+                # A job took the device; try again once it is idle
+                self.submit(file_path)
+            except Exception as e:
+                try:
+                    self.on_indexed(file_path, None, None, [], e)
+                except Exception:
+                    traceback.print_exc()
@@ -9,6 +9,19 @@ import re
 import json
 import traceback
 
+import tracing
+import progressive
+from profiles import DEFAULT_PROFILE, load_profiles, get_video_args
+from frame_path import BACKENDS, DEFAULT_BACKEND, detect_capabilities, describe_stages
+from ffmpeg_command import get_scale, plan_frame_path, build_ffmpeg_command
+from io_lanes import DEFAULT_DEVICE_LIMIT, DeviceLanes
+from verify import VERIFY_LEVELS, DEFAULT_VERIFY_LEVEL, VerificationError, verify_output
+from rate_control import RATE_TARGET_MODES, probe_timing, plan_rate_target
+from progressive import OUTPUT_MODES, DEFAULT_OUTPUT_MODE, output_size, prepare_output, existing_outputs, remove_output
+from keyframe_index import BackgroundIndexer, load_probe
+from admission import ESTIMATE_MARGIN, SpaceReservations, estimate_output_bytes
+from resources import RESOURCE_CLASSES, DEFAULT_RESOURCE_CLASS, get_resource_class, launch_ffmpeg, format_applied_limits
+
 # ======== Utility Functions ========
 
 def check_ffmpeg():
@@ -38,222 +51,241 @@ def check_ffmpeg():
 
 def get_video_resolution(file_path):
     try:
-        result = subprocess.run(
-            ["ffprobe", "-v", "error", "-select_streams", "v:0",
-             "-show_entries", "stream=width,height,codec_name", "-of", "json", file_path],
-            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        with tracing.span("ffprobe", "probe", file=os.path.basename(file_path)):
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=width,height,codec_name,pix_fmt", "-of", "json", file_path],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
         info = json.loads(result.stdout)
         stream = info.get("streams", [{}])[0]
-        return int(stream.get("width", 0)), int(stream.get("height", 0)), stream.get("codec_name", "")
+        return int(stream.get("width", 0)), int(stream.get("height", 0)), stream.get("codec_name", ""), stream.get("pix_fmt", "")
     except Exception:
-        return 0, 0, ""
+        return 0, 0, "", ""
 
 # ======== Core Transcoding Logic ========
 
-def build_ffmpeg_command(app, file_path, output_path):
-    """Builds the FFmpeg command based on user settings and profiles."""
-    scale_enabled = app.downscale_var.get()
-    codec_support = app.codec_support
-    output_format = app.output_format_var.get()
-    audio_codec = app.audio_codec_var.get()
-    audio_bitrate = app.audio_bitrate_var.get()
-    audio_sample_rate = app.audio_sample_rate_var.get()
-    audio_channels = app.audio_channels_var.get()
-
-    width, height, input_codec = get_video_resolution(file_path)
-
-    command = [
-        "ffmpeg",
-        "-hwaccel_output_format", "cuda",
-        "-extra_hw_frames", "3",
-        "-thread_queue_size", "1024",
-        "-i", file_path
-    ]
-
-    # Video Encoding Settings
-    if codec_support == "hevc":
-        command.extend([
-            "-c:v", "hevc_nvenc",
-            "-preset", "p2",
-            "-tune", "hq",
-            "-rc", "vbr",
-            "-cq", "19",
-            "-qmin", "1",
-            "-qmax", "51",
-            "-b:v", "20M",
-            "-maxrate", "30M",
-            "-bufsize", "40M",
-            "-spatial-aq", "1",
-            "-temporal-aq", "1",
-            "-refs", "3",
-            "-g", "250",
-            "-bf", "3"
-        ])
-    else:
-        command.extend([
-            "-c:v", "h264_nvenc",
-            "-preset", "p2",
-            "-tune", "hq",
-            "-rc", "vbr",
-            "-cq", "19",
-            "-qmin", "1",
-            "-qmax", "51",
-            "-b:v", "20M",
-            "-maxrate", "30M",
-            "-bufsize", "40M",
-            "-spatial-aq", "1",
-            "-temporal-aq", "1",
-            "-refs", "3",
-            "-g", "250",
-            "-bf", "3"
-        ])
-
-    # Audio Settings
-    command.extend([
-        "-c:a", "copy" if input_codec == "aac" and audio_codec == "aac" else audio_codec,
-        "-b:a", f"{audio_bitrate}k",
-        "-ar", str(audio_sample_rate),
-        "-ac", str(audio_channels)
-    ])
-
-    # Output Format and Common Settings
-    command.extend([
-        "-f", output_format,
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-map_metadata", "0",
-        "-map", "0"
-    ])
-
-    if scale_enabled:
-        target_width = app.scale_width_var.get()
-        target_height = app.scale_height_var.get()
-        command.extend(["-vf", f"scale={target_width}:{target_height}"])
-
-    command.append(output_path)
-    return command
+def get_output_path(app, file_path, settings):
+    output_folder = app.output_folder if app.output_folder else os.path.dirname(file_path)
+    base_name = os.path.splitext(os.path.basename(file_path))[0] + "_transcoded"
+    return progressive.get_output_path(output_folder, base_name, settings["output_format"], settings.get("output_mode", DEFAULT_OUTPUT_MODE))
+
+def get_job_timing(app, file_path):
+    """Returns the input's (duration, fps), probed once per job; (0, 0) if unknown."""
+    metrics = app.job_metrics.setdefault(file_path, {})
+    if "timing" not in metrics:
+        try:
+            metrics["timing"] = probe_timing(file_path)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            metrics["timing"] = (0.0, 0.0)
+    return metrics["timing"]
+
+def estimate_job_output(app, file_path, settings):
+    metrics = app.job_metrics.get(file_path, {})
+    if "rate_plan" in metrics:
+        return int(metrics["rate_plan"]["target_bytes"] * (1 + ESTIMATE_MARGIN))
+    duration, _ = get_job_timing(app, file_path)
+    profile = app.profiles[settings["profile"]]
+    return estimate_output_bytes(
+        duration,
+        # VBR+CQ profiles may run up to their maxrate on hard content
+        profile["maxrate_bps"] or profile["bitrate_bps"],
+        settings["audio_bitrate"] * 1000,
+        os.path.getsize(file_path)
+    )
+
+def admit_job(app, file_path, output_path, settings, output_queue):
+    """Reserves the job's estimated output size, waiting while the target disk is full."""
+    estimate = estimate_job_output(app, file_path, settings)
+    app.job_metrics.setdefault(file_path, {})["reserved_bytes"] = estimate
+
+    def on_wait(available):
+        output_queue.put((file_path, None, f"Warning: {os.path.basename(file_path)} is waiting for disk space "
+                                           f"({estimate / 1e9:.1f} GB needed, {available / 1e9:.1f} GB available)"))
+
+    with tracing.span("disk_admission", "admission", file=os.path.basename(file_path), estimate=estimate):
+        return app.space_reservations.reserve(file_path, output_path, estimate, app.stop_event, on_wait)
+
+def plan_job_rate(app, file_path, settings, probe, resource_class, output_queue):
+    """Runs sample encodes for size-targeted jobs and returns the encoder overrides."""
+    mode = settings.get("rate_target_mode", "none")
+    if mode == "none":
+        return None
+    profile = app.profiles[settings["profile"]]
+    frame_path = plan_frame_path(app, settings, probe)
+    # Budgets apply to the encoded frames, not the input's
+    frame_size = get_scale(profile, settings, probe) or probe[:2]
+    try:
+        plan = plan_rate_target(
+            file_path,
+            get_video_args(profile, frame_path["encoder"], app.codec_support),
+            frame_path,
+            mode,
+            settings["rate_target_value"],
+            frame_size,
+            settings["audio_bitrate"] * 1000,
+            resource_class,
+            get_job_timing(app, file_path),
+            profile["cq_range"]
+        )
+    except (ValueError, RuntimeError, OSError, subprocess.CalledProcessError) as e:
+        output_queue.put((file_path, None, f"Warning: {os.path.basename(file_path)} size target skipped, using profile settings: {e}"))
+        return None
+    app.job_metrics.setdefault(file_path, {})["rate_plan"] = plan
+    return plan["overrides"]
 
 def remux_video(app, file_path, output_queue):
-    scale_enabled = app.downscale_var.get()
-    output_folder = app.output_folder if app.output_folder else os.path.dirname(file_path)
-    base_name = os.path.splitext(os.path.basename(file_path))[0] + "_transcoded.mp4"
-    output_path = os.path.join(output_folder, base_name)
-
-    # Get input codec and resolution
-    width, height, input_codec = get_video_resolution(file_path)
-
-    # Base command with optimized settings
-    command = [
-        "ffmpeg",
-        "-hwaccel_output_format", "cuda",
-        "-extra_hw_frames", "3",
-        "-thread_queue_size", "1024",
-        "-i", file_path
-    ]
-
-    # Add encoding settings based on codec support
-    if app.codec_support == "hevc":
-        command.extend([
-            "-c:v", "hevc_nvenc",
-            "-preset", "p2",
-            "-tune", "hq",
-            "-rc", "vbr",
-            "-cq", "19",
-            "-qmin", "1",
-            "-qmax", "51",
-            "-b:v", "20M",
-            "-maxrate", "30M",
-            "-bufsize", "40M",
-            "-spatial-aq", "1",
-            "-temporal-aq", "1",
-            "-refs", "3",
-            "-g", "250",
-            "-bf", "3"
-        ])
-    else:
-        command.extend([
-            "-c:v", "h264_nvenc",
-            "-preset", "p2",
-            "-tune", "hq",
-            "-rc", "vbr",
-            "-cq", "19",
-            "-qmin", "1",
-            "-qmax", "51",
-            "-b:v", "20M",
-            "-maxrate", "30M",
-            "-bufsize", "40M",
-            "-spatial-aq", "1",
-            "-temporal-aq", "1",
-            "-refs", "3",
-            "-g", "250",
-            "-bf", "3"
-        ])
-
-    # Audio settings
-    command.extend([
-        "-c:a", "copy" if input_codec == "aac" else "aac",
-        "-b:a", "192k",
-        "-ar", "48000"
-    ])
-
-    # Common settings
-    command.extend([
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-map_metadata", "0",
-        # Map only video and audio streams, excluding timecode
-        "-map", "0:v",
-        "-map", "0:a"
-    ])
-
-    if scale_enabled:
-        command.extend(["-vf", "scale=1920:1080"])
-
-    command.append(output_path)
+    settings = app.job_options[file_path]
+    output_path = get_output_path(app, file_path, settings)
+
+    # Reuse the probe taken when the job was dequeued
+    probe = app.job_metrics.get(file_path, {}).get("probe") or get_video_resolution(file_path)
 
     try:
+        # Snapshot what is already there, so a failed job only removes its own files
+        existing = existing_outputs(output_path)
+        if output_path in existing:
+            output_queue.put((file_path, None, f"Error: {output_path} already exists; move it or pick another output folder"))
+            return
+        resource_class = get_resource_class(settings.get("resource_class", DEFAULT_RESOURCE_CLASS))
+        video_overrides = plan_job_rate(app, file_path, settings, probe, resource_class, output_queue)
+        command = build_ffmpeg_command(app, file_path, output_path, settings, probe, video_overrides)
+        prepare_output(output_path, settings.get("output_mode", DEFAULT_OUTPUT_MODE))
+        app.job_metrics.setdefault(file_path, {})["frame_path"] = plan_frame_path(app, settings, probe)["stages"]
+        if not admit_job(app, file_path, output_path, settings, output_queue):
+            output_queue.put((file_path, None, "Error: Stopped while waiting for disk space"))
+            return
         print("Executing FFmpeg command:", " ".join(command))
         
-        process = subprocess.Popen(
+        process, applied_limits = launch_ffmpeg(
             command,
+            resource_class,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True
         )
         
         app.transcoding_processes[file_path] = process
+        app.job_metrics.setdefault(file_path, {})["limits"] = applied_limits
         
+        # Phase boundaries: spawn -> first progress line is encoder startup,
+        # first -> last progress line is the encode, last progress -> exit is
+        # the final mux/faststart write (near zero for progressive outputs)
+        spawned_at = tracing.now()
+        first_progress_at = last_progress_at = None
         stderr_output = []
         for line in process.stderr:
             stderr_output.append(line)
             print(line, end='')
+            if line.startswith("frame="):
+                last_progress_at = tracing.now()
+                if first_progress_at is None:
+                    first_progress_at = last_progress_at
         
         process.wait()
+        exited_at = tracing.now()
+        record_phase_spans(app, file_path, spawned_at, first_progress_at, last_progress_at, exited_at)
+        reserved_bytes, written_bytes = app.space_reservations.usage(file_path)
+        app.job_metrics[file_path]["written_bytes"] = written_bytes
+        if written_bytes > reserved_bytes:
+            output_queue.put((file_path, None, f"Warning: {os.path.basename(file_path)} wrote {written_bytes / 1e9:.2f} GB, "
+                                               f"over its {reserved_bytes / 1e9:.2f} GB reservation"))
         
+        # Recorded on the job's trace span, so replays can reproduce failures
+        app.job_metrics[file_path]["status"] = "encoded" if process.returncode == 0 else "failed"
         if process.returncode == 0:
-            output_queue.put((file_path, output_path, "Success"))
+            if settings.get("verify_level", "none") == "none":
+                output_queue.put((file_path, output_path, "Success"))
+            else:
+                # Verification runs on its own thread so the next encode can start
+                output_queue.put((file_path, output_path, "Verifying"))
+                app.verify_queue.put((file_path, output_path))
         else:
             error_message = "FFmpeg Error:\n" + "\n".join(stderr_output[-5:])
             output_queue.put((file_path, None, f"Error: {error_message}"))
+            # Don't leave a partial output behind eating the space we freed up for it
+            remove_output(output_path, existing)
             
     except Exception as e:
         output_queue.put((file_path, None, f"Error: {str(e)}\n{traceback.format_exc()}"))
     finally:
+        app.space_reservations.release(file_path)
         if file_path in app.transcoding_processes:
             del app.transcoding_processes[file_path]
 
+def record_phase_spans(app, file_path, spawned_at, first_progress_at, last_progress_at, exited_at):
+    name = os.path.basename(file_path)
+    if first_progress_at is None:
+        # ffmpeg never reported progress (failed or very short input)
+        phases = [("encoder_startup", spawned_at, exited_at)]
+    else:
+        phases = [
+            ("encoder_startup", spawned_at, first_progress_at),
+            ("encode", first_progress_at, last_progress_at),
+            ("finalize_output", last_progress_at, exited_at),
+        ]
+    timings = app.job_metrics.setdefault(file_path, {}).setdefault("timings", {})
+    for phase, start, end in phases:
+        timings[phase] = end - start
+        tracing.add_span(phase, start, end, "ffmpeg", file=name)
+
+def get_job_devices(app, file_path):
+    # The read lane of the input's device and the write lane of the output's
+    output_folder = app.output_folder if app.output_folder else os.path.dirname(file_path)
+    return app.device_lanes.job_lanes(file_path, output_folder)
+
 def process_queue(remux_queue, output_queue, stop_event, app):
     while not stop_event.is_set():
+        # Take the queued job whose disks are least busy, within per-device limits
+        taken = app.device_lanes.take(remux_queue, lambda path: get_job_devices(app, path), stop_event)
+        if taken is None:
+            continue
+        file_path, devices = taken
+        name = os.path.basename(file_path)
         try:
-            file_path = remux_queue.get(timeout=1)
-            width, height, _ = get_video_resolution(file_path)
-            if width < 1280 or height < 720:
-                warning_msg = f"Warning: {os.path.basename(file_path)} is below HD resolution. Consider enabling scaling."
-                output_queue.put((file_path, None, warning_msg))
-
-            remux_video(app, file_path, output_queue)
+            app.job_metrics.setdefault(file_path, {})["devices"] = app.device_lanes.describe(devices)
+            queued_at = app.job_options.get(file_path, {}).get("queued_at")
+            if queued_at is not None:
+                tracing.add_span("queue_wait", queued_at, tracing.now(), "queue", track=f"queued: {name}", file=name)
+
+            job_started = tracing.now()
+            try:
+                # The background indexer may already have cached the probe
+                probe = load_probe(file_path) or get_video_resolution(file_path)
+                app.job_metrics.setdefault(file_path, {})["probe"] = probe
+                width, height = probe[:2]
+                if width < 1280 or height < 720:
+                    warning_msg = f"Warning: {name} is below HD resolution. Consider enabling scaling."
+                    output_queue.put((file_path, None, warning_msg))
+
+                remux_video(app, file_path, output_queue)
+            finally:
+                tracing.add_span("job", job_started, tracing.now(), "job", file=name,
+                                 devices=app.device_lanes.describe(devices),
+                                 status=app.job_metrics.get(file_path, {}).get("status", "not run"))
+        except Exception as e:
+            # A bad file (moved, share offline, ...) fails its own row, not the worker
+            output_queue.put((file_path, None, f"Error: {str(e)}\n{traceback.format_exc()}"))
+        finally:
+            app.device_lanes.release(devices)
             remux_queue.task_done()
+        tracing.flush()
+
+def process_verify_queue(verify_queue, output_queue, stop_event, app):
+    while not stop_event.is_set():
+        try:
+            file_path, output_path = verify_queue.get(timeout=1)
+            settings = app.job_options[file_path]
+            resource_class = get_resource_class(settings.get("resource_class", DEFAULT_RESOURCE_CLASS))
+            metrics = app.job_metrics.setdefault(file_path, {})
+            try:
+                metrics["verification"] = verify_output(file_path, output_path, settings["verify_level"], resource_class)
+                output_queue.put((file_path, output_path, "Success"))
+            except (VerificationError, OSError, ValueError) as e:
+                metrics["verification"] = f"failed: {e}"
+                output_queue.put((file_path, None, f"Error: Verification failed: {e}"))
+            verify_queue.task_done()
+            tracing.flush()
         except queue.Empty:
             continue
 
@@ -266,6 +298,17 @@ class RemuxTool(TkinterDnD.Tk):
         if not self.codec_support:
             self.quit()
 
+        # What this ffmpeg build can do on the GPU, for planning frame paths
+        self.capabilities = detect_capabilities()
+
+        # Encoding profiles are validated and compiled once, up front
+        try:
+            self.profiles = load_profiles()
+        except ValueError as e:
+            messagebox.showerror("Invalid Encoding Profiles", str(e))
+            self.profiles = {}
+            self.quit()
+
         # Initialize main window properties
         self.title("Video Transcoder - Advanced")
         self.resizable(True, True)
@@ -276,8 +319,23 @@ class RemuxTool(TkinterDnD.Tk):
         self.remux_queue = queue.Queue()
         self.output_queue = queue.Queue()
         self.stop_event = threading.Event()
-        self.worker_thread = None
+        self.worker_threads = []
+        self.device_lanes = DeviceLanes()
+        self.space_reservations = SpaceReservations()
+        self.verify_queue = queue.Queue()
+        self.verify_thread = None
         self.transcoding_processes = {}
+        self.job_options = {}
+        self.job_metrics = {}
+
+        # Listbox row -> queued file, for showing thumbnails on selection
+        self.listbox_files = {}
+        self.indexer = BackgroundIndexer(self.on_indexed, get_video_resolution, self.device_lanes, self.stop_event)
+
+        # Optional Chrome/Perfetto trace of every job phase
+        trace_path = os.environ.get("MEDIAREMUX_TRACE")
+        if trace_path:
+            tracing.start_tracing(trace_path)
 
         # Variables for user-configurable settings
         self.downscale_var = tk.BooleanVar(value=False)
@@ -288,6 +346,15 @@ class RemuxTool(TkinterDnD.Tk):
         self.audio_channels_var = tk.IntVar(value=2)
         self.scale_width_var = tk.IntVar(value=1920)
         self.scale_height_var = tk.IntVar(value=1080)
+        self.resource_class_var = tk.StringVar(value=DEFAULT_RESOURCE_CLASS)
+        self.max_workers_var = tk.IntVar(value=2)
+        self.device_limit_var = tk.IntVar(value=DEFAULT_DEVICE_LIMIT)
+        self.backend_var = tk.StringVar(value=DEFAULT_BACKEND)
+        self.output_mode_var = tk.StringVar(value=DEFAULT_OUTPUT_MODE)
+        self.verify_level_var = tk.StringVar(value=DEFAULT_VERIFY_LEVEL)
+        self.rate_target_mode_var = tk.StringVar(value="none")
+        self.rate_target_value_var = tk.DoubleVar(value=0.0)
+        self.profile_var = tk.StringVar(value=DEFAULT_PROFILE if DEFAULT_PROFILE in self.profiles else next(iter(self.profiles), ""))
 
         # Output folder
         self.output_folder = None
@@ -315,6 +382,12 @@ class RemuxTool(TkinterDnD.Tk):
         self.queue_listbox = tk.Listbox(middle_frame, bg="#1e1e1e", fg="white", font=("Arial", 12), selectmode=tk.BROWSE, yscrollcommand=scrollbar.set)
         self.queue_listbox.grid(row=0, column=0, sticky="nsew")
         scrollbar.config(command=self.queue_listbox.yview)
+        self.queue_listbox.bind("<<ListboxSelect>>", self.on_listbox_select)
+
+        # Keyframe thumbnails of the selected file
+        self.thumbnail_frame = tk.Frame(middle_frame, bg="#2e2e2e")
+        self.thumbnail_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.thumbnail_images = []
 
         # --- Bottom Frame ---
         bottom_frame = tk.Frame(self, bg="#2e2e2e")
@@ -343,6 +416,11 @@ class RemuxTool(TkinterDnD.Tk):
         audio_codec_menu = ttk.Combobox(bottom_frame, textvariable=self.audio_codec_var, values=["aac", "opus", "vorbis", "flac"], width=10)
         audio_codec_menu.grid(row=2, column=3)
 
+        # Resource class applied to newly queued files
+        tk.Label(bottom_frame, text="Priority:", bg="#2e2e2e", fg="white").grid(row=2, column=4)
+        resource_class_menu = ttk.Combobox(bottom_frame, textvariable=self.resource_class_var, values=list(RESOURCE_CLASSES), width=10, state="readonly")
+        resource_class_menu.grid(row=2, column=5)
+
         # Audio bitrate
         tk.Label(bottom_frame, text="Audio Bitrate (kbps):", bg="#2e2e2e", fg="white").grid(row=3, column=0)
         tk.Entry(bottom_frame, textvariable=self.audio_bitrate_var, width=7).grid(row=3, column=1)
@@ -362,18 +440,51 @@ class RemuxTool(TkinterDnD.Tk):
         self.output_folder_label = tk.Label(bottom_frame, text="No folder selected", bg="#2e2e2e", fg="white", font=("Arial", 10))
         self.output_folder_label.grid(row=4, column=1, columnspan=2, sticky="w", padx=5, pady=5)
 
+        # Encoding profile applied to newly queued files
+        tk.Label(bottom_frame, text="Profile:", bg="#2e2e2e", fg="white").grid(row=4, column=3)
+        profile_menu = ttk.Combobox(bottom_frame, textvariable=self.profile_var, values=list(self.profiles), width=12, state="readonly")
+        profile_menu.grid(row=4, column=4, columnspan=2, sticky="w")
+
+        # Size/bits-per-pixel budget, planned from sample encodes
+        tk.Label(bottom_frame, text="Rate Target:", bg="#2e2e2e", fg="white").grid(row=5, column=0)
+        rate_target_menu = ttk.Combobox(bottom_frame, textvariable=self.rate_target_mode_var, values=list(RATE_TARGET_MODES), width=10, state="readonly")
+        rate_target_menu.grid(row=5, column=1)
+        tk.Label(bottom_frame, text="Budget (MB or bpp):", bg="#2e2e2e", fg="white").grid(row=5, column=2)
+        tk.Entry(bottom_frame, textvariable=self.rate_target_value_var, width=7).grid(row=5, column=3)
+
+        # Output verification depth
+        tk.Label(bottom_frame, text="Verify:", bg="#2e2e2e", fg="white").grid(row=5, column=4)
+        verify_menu = ttk.Combobox(bottom_frame, textvariable=self.verify_level_var, values=list(VERIFY_LEVELS), width=10, state="readonly")
+        verify_menu.grid(row=5, column=5)
+
+        # Parallel workers and how many jobs may share one disk
+        tk.Label(bottom_frame, text="Workers:", bg="#2e2e2e", fg="white").grid(row=6, column=0)
+        tk.Entry(bottom_frame, textvariable=self.max_workers_var, width=5).grid(row=6, column=1)
+        tk.Label(bottom_frame, text="Reads per Disk:", bg="#2e2e2e", fg="white").grid(row=6, column=2)
+        tk.Entry(bottom_frame, textvariable=self.device_limit_var, width=5).grid(row=6, column=3)
+
+        # Progressive output: fragmented MP4 or HLS segments usable mid-encode
+        tk.Label(bottom_frame, text="Output:", bg="#2e2e2e", fg="white").grid(row=6, column=4)
+        output_mode_menu = ttk.Combobox(bottom_frame, textvariable=self.output_mode_var, values=list(OUTPUT_MODES), width=10, state="readonly")
+        output_mode_menu.grid(row=6, column=5)
+
+        # Frame path backend: CUDA decode/scale/encode with per-stage fallback, or software only
+        tk.Label(bottom_frame, text="Backend:", bg="#2e2e2e", fg="white").grid(row=7, column=0)
+        backend_menu = ttk.Combobox(bottom_frame, textvariable=self.backend_var, values=list(BACKENDS), width=10, state="readonly")
+        backend_menu.grid(row=7, column=1)
+
         # Action buttons
         self.browse_button = tk.Button(bottom_frame, text="Browse Files", command=self.open_file_dialog)
-        self.browse_button.grid(row=5, column=0, padx=5, pady=10, sticky="w")
+        self.browse_button.grid(row=8, column=0, padx=5, pady=10, sticky="w")
 
         self.start_button = tk.Button(bottom_frame, text="Start Transcoding", command=self.start_transcoding)
-        self.start_button.grid(row=5, column=1, padx=5, pady=10, sticky="w")
+        self.start_button.grid(row=8, column=1, padx=5, pady=10, sticky="w")
 
         self.stop_button = tk.Button(bottom_frame, text="Stop Transcoding", command=self.stop_transcoding)
-        self.stop_button.grid(row=5, column=2, padx=5, pady=10, sticky="w")
+        self.stop_button.grid(row=8, column=2, padx=5, pady=10, sticky="w")
 
         self.clear_button = tk.Button(bottom_frame, text="Clear Queue", command=self.clear_queue)
-        self.clear_button.grid(row=5, column=3, padx=5, pady=10, sticky="e")
+        self.clear_button.grid(row=8, column=3, padx=5, pady=10, sticky="e")
 
         # Drag and drop setup
         self.drop_target_register(DND_FILES)
@@ -381,21 +492,36 @@ class RemuxTool(TkinterDnD.Tk):
 
     # ======== Event Handlers and Threading ========
     def start_worker_thread(self):
-        if self.worker_thread is None or not self.worker_thread.is_alive():
+        self.worker_threads = [thread for thread in self.worker_threads if thread.is_alive()]
+        if not self.worker_threads:
             self.stop_event.clear()
-            self.worker_thread = threading.Thread(
+        self.device_lanes.default_limit = max(1, self.device_limit_var.get())
+        # Output writes are light; one write slot per worker keeps a shared
+        # output folder from serializing the workers
+        self.device_lanes.write_limit = max(1, self.max_workers_var.get())
+        for index in range(len(self.worker_threads), max(1, self.max_workers_var.get())):
+            worker_thread = threading.Thread(
                 target=process_queue,
                 args=(self.remux_queue, self.output_queue, self.stop_event, self),
+                name=f"remux-worker-{index}",
+                daemon=True
+            )
+            worker_thread.start()
+            self.worker_threads.append(worker_thread)
+        if self.verify_thread is None or not self.verify_thread.is_alive():
+            self.verify_thread = threading.Thread(
+                target=process_verify_queue,
+                args=(self.verify_queue, self.output_queue, self.stop_event, self),
+                name="verify-worker",
                 daemon=True
             )
-            self.worker_thread.start()
+            self.verify_thread.start()
 
     def on_drop(self, event):
         file_paths = self.parse_dropped_files(event.data)
         for file_path in file_paths:
             if file_path:
-                self.queue_listbox.insert(tk.END, f"Queued: {os.path.basename(file_path)}")
-                self.remux_queue.put(file_path)
+                self.enqueue_file(file_path)
 
     def parse_dropped_files(self, data):
         return re.findall(r'\{(.*?)\}', data) or data.split()
@@ -403,8 +529,65 @@ class RemuxTool(TkinterDnD.Tk):
     def open_file_dialog(self):
         file_paths = filedialog.askopenfilenames(filetypes=[("Video Files", "*.mp4 *.mov *.avi *.mkv *.mxf *.webm *.flv *.ts")])
         for file_path in file_paths:
-            self.queue_listbox.insert(tk.END, f"Queued: {os.path.basename(file_path)}")
-            self.remux_queue.put(file_path)
+            self.enqueue_file(file_path)
+
+    def enqueue_file(self, file_path):
+        # Results of an earlier run of the same file (rate plan, verification,
+        # status) must not leak into this one; only the input probes carry over
+        previous = self.job_metrics.get(file_path, {})
+        self.job_metrics[file_path] = {key: previous[key] for key in ("probe", "timing") if key in previous}
+
+        # Per-job settings are captured at queue time so later changes only
+        # affect new files and workers never read Tk variables
+        self.job_options[file_path] = {
+            "resource_class": self.resource_class_var.get(),
+            "profile": self.profile_var.get(),
+            "downscale": self.downscale_var.get(),
+            "scale": (self.scale_width_var.get(), self.scale_height_var.get()),
+            "output_format": self.output_format_var.get(),
+            "output_mode": self.output_mode_var.get(),
+            "backend": self.backend_var.get(),
+            "audio_codec": self.audio_codec_var.get(),
+            "audio_bitrate": self.audio_bitrate_var.get(),
+            "audio_sample_rate": self.audio_sample_rate_var.get(),
+            "audio_channels": self.audio_channels_var.get(),
+            "rate_target_mode": self.rate_target_mode_var.get(),
+            "rate_target_value": self.rate_target_value_var.get(),
+            "verify_level": self.verify_level_var.get(),
+            "queued_at": tracing.now(),
+        }
+        self.listbox_files[self.queue_listbox.size()] = file_path
+        self.queue_listbox.insert(tk.END, f"Queued: {os.path.basename(file_path)} [{self.profile_var.get()}, {self.resource_class_var.get()}]")
+        self.remux_queue.put(file_path)
+        self.indexer.submit(file_path)
+
+    def on_indexed(self, file_path, index, probe_data, thumbnails, error):
+        # Called on the indexer thread; the GUI picks the result up from the output queue
+        if error is not None:
+            self.output_queue.put((file_path, None, f"Warning: could not index {os.path.basename(file_path)}: {error}"))
+            return
+        metrics = self.job_metrics.setdefault(file_path, {})
+        metrics["keyframes"] = len(index)
+        metrics["mean_gop_seconds"] = probe_data.get("mean_gop_seconds", 0.0)
+        metrics["thumbnails"] = thumbnails
+        self.output_queue.put((file_path, None, "Indexed"))
+
+    def on_listbox_select(self, event):
+        selection = self.queue_listbox.curselection()
+        if selection and selection[0] in self.listbox_files:
+            self.show_thumbnails(self.listbox_files[selection[0]])
+
+    def show_thumbnails(self, file_path):
+        for widget in self.thumbnail_frame.winfo_children():
+            widget.destroy()
+        self.thumbnail_images = []
+        for thumb_path in self.job_metrics.get(file_path, {}).get("thumbnails", []):
+            try:
+                image = tk.PhotoImage(file=thumb_path)
+            except tk.TclError:
+                continue
+            self.thumbnail_images.append(image)
+            tk.Label(self.thumbnail_frame, image=image, bg="#2e2e2e").pack(side="left", padx=2)
 
     def open_output_folder_dialog(self):
         folder = filedialog.askdirectory(title="Select Output Folder")
@@ -421,6 +604,8 @@ class RemuxTool(TkinterDnD.Tk):
             self.start_worker_thread()
 
     def stop_transcoding(self):
+        # Jobs still waiting for disk space give up their worker and lanes too
+        self.space_reservations.cancel_waiting()
         for file_path, process in list(self.transcoding_processes.items()):
             process.terminate()
             self.queue_listbox.insert(tk.END, f"Stopped: {os.path.basename(file_path)}")
@@ -430,6 +615,8 @@ class RemuxTool(TkinterDnD.Tk):
         with self.remux_queue.mutex:
             self.remux_queue.queue.clear()
         self.queue_listbox.delete(0, tk.END)
+        self.listbox_files.clear()
+        self.show_thumbnails(None)
         self.progress["value"] = 0
 
     def check_output_queue(self):
@@ -437,8 +624,33 @@ class RemuxTool(TkinterDnD.Tk):
             file_path, output_path, status = self.output_queue.get()
             if status and status.startswith("Warning:"):
                 self.queue_listbox.insert(tk.END, status)
+            elif status == "Indexed":
+                metrics = self.job_metrics.get(file_path, {})
+                self.queue_listbox.insert(
+                    tk.END,
+                    f"    Indexed: {os.path.basename(file_path)} ({metrics.get('keyframes', 0)} keyframes, "
+                    f"~{metrics.get('mean_gop_seconds', 0):.1f}s GOP)"
+                )
+            elif status == "Verifying":
+                self.queue_listbox.insert(tk.END, f"Encoded, verifying: {os.path.basename(file_path)}")
             elif status == "Success":
                 self.queue_listbox.insert(tk.END, f"Completed: {os.path.basename(file_path)} -> {output_path}")
+                frame_path = self.job_metrics.get(file_path, {}).get("frame_path")
+                if frame_path:
+                    self.queue_listbox.insert(tk.END, f"    Frame path: {describe_stages(frame_path)}")
+                verification = self.job_metrics.get(file_path, {}).get("verification")
+                if verification:
+                    self.queue_listbox.insert(tk.END, f"    Verified: {', '.join(verification)}")
+                limits = self.job_metrics.get(file_path, {}).get("limits")
+                if limits:
+                    self.queue_listbox.insert(tk.END, f"    Limits: {format_applied_limits(limits)}")
+                rate_plan = self.job_metrics.get(file_path, {}).get("rate_plan")
+                if rate_plan:
+                    self.queue_listbox.insert(
+                        tk.END,
+                        f"    Rate plan: cq={rate_plan['cq']} predicted={rate_plan['predicted_bytes'] / 1e6:.1f}MB "
+                        f"target={rate_plan['target_bytes'] / 1e6:.1f}MB actual={output_size(output_path) / 1e6:.1f}MB"
+                    )
             elif status and status.startswith("Error:"):
                 self.queue_listbox.insert(tk.END, f"Error processing: {os.path.basename(file_path)}\n{status}")
             else:
@@ -457,6 +669,7 @@ class RemuxTool(TkinterDnD.Tk):
     def on_close(self):
         self.stop_event.set()
         self.stop_transcoding()
+        tracing.flush()
         self.destroy()
 
 # ======== Entry Point ========
@@ -0,0 +1,168 @@
+import os
+import re
+import json
+
+# ======== Encoding Profiles ========
+#
+# Profiles are named speed/quality tiers kept in profiles.json (or a TOML file
+# with the same layout). They are validated and compiled once at startup into
+# per-codec argument lists, so building a job's command only has to fill in
+# paths and probed values.
+
+DEFAULT_PROFILES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles.json")
+PROFILES_PATH = os.environ.get("MEDIAREMUX_PROFILES", DEFAULT_PROFILES_PATH)
+
+DEFAULT_PROFILE = "balanced"
+
+ENCODERS = {"hevc": "hevc_nvenc", "h264": "h264_nvenc"}
+SOFTWARE_ENCODERS = {"hevc": "libx265", "h264": "libx264"}
+
+# Rough NVENC preset -> x264/x265 preset equivalents for the software path
+SOFTWARE_PRESETS = {
+    "p1": "ultrafast", "p2": "superfast", "p3": "veryfast", "p4": "faster",
+    "p5": "fast", "p6": "medium", "p7": "slow",
+}
+
+PRESETS = {f"p{i}" for i in range(1, 8)}
+TUNES = {"hq", "ll", "ull", "lossless"}
+RATE_CONTROLS = {"vbr", "cbr", "constqp"}
+BITRATE_PATTERN = re.compile(r"^\d+(\.\d+)?[kKMG]?$")
+BITRATE_UNITS = {"": 1, "k": 1_000, "K": 1_000, "M": 1_000_000, "G": 1_000_000_000}
+
+def is_int(value):
+    # bool is a subclass of int; "cq": true must not pass as 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+# Profile key -> (ffmpeg option, validator), in the order options are emitted
+PROFILE_OPTIONS = [
+    ("preset", "-preset", lambda v: v in PRESETS),
+    ("tune", "-tune", lambda v: v in TUNES),
+    ("rc", "-rc", lambda v: v in RATE_CONTROLS),
+    ("cq", "-cq", lambda v: is_int(v) and 0 <= v <= 51),
+    ("qmin", "-qmin", lambda v: is_int(v) and 0 <= v <= 51),
+    ("qmax", "-qmax", lambda v: is_int(v) and 0 <= v <= 51),
+    ("bitrate", "-b:v", lambda v: isinstance(v, str) and BITRATE_PATTERN.match(v)),
+    ("maxrate", "-maxrate", lambda v: isinstance(v, str) and BITRATE_PATTERN.match(v)),
+    ("bufsize", "-bufsize", lambda v: isinstance(v, str) and BITRATE_PATTERN.match(v)),
+    ("spatial_aq", "-spatial-aq", lambda v: isinstance(v, bool)),
+    ("temporal_aq", "-temporal-aq", lambda v: isinstance(v, bool)),
+    ("refs", "-refs", lambda v: is_int(v) and 0 <= v <= 16),
+    ("gop", "-g", lambda v: is_int(v) and v > 0),
+    ("bframes", "-bf", lambda v: is_int(v) and 0 <= v <= 4),
+]
+REQUIRED_KEYS = {"preset", "rc", "bitrate"}
+EXTRA_KEYS = {"description", "scale"}
+
+def parse_bitrate(value):
+    """Converts an ffmpeg bitrate string such as "20M" to bits per second."""
+    match = BITRATE_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid bitrate: {value}")
+    unit = value[-1] if value[-1] in BITRATE_UNITS else ""
+    number = value[:-1] if unit else value
+    return int(float(number) * BITRATE_UNITS[unit])
+
+def validate_profile(name, profile):
+    """Returns a list of problems with a profile definition; empty if valid."""
+    if not isinstance(profile, dict):
+        return [f"{name}: profile must be a table/object"]
+    problems = []
+    known = {key for key, _, _ in PROFILE_OPTIONS} | EXTRA_KEYS
+    for key in sorted(set(profile) - known):
+        problems.append(f"{name}: unknown key '{key}'")
+    for key in sorted(REQUIRED_KEYS - set(profile)):
+        problems.append(f"{name}: missing required key '{key}'")
+    for key, _, is_valid in PROFILE_OPTIONS:
+        if key in profile and not is_valid(profile[key]):
+            problems.append(f"{name}: invalid value for '{key}': {profile[key]!r}")
+    scale = profile.get("scale")
+    if scale is not None and not (
+        isinstance(scale, list) and len(scale) == 2
+        and all(is_int(v) and v > 0 for v in scale)
+    ):
+        problems.append(f"{name}: 'scale' must be [width, height]")
+    return problems
+
+def fit_scale(box, width, height):
+    """Fits width x height inside a profile's [width, height] box.
+
+    The aspect ratio is kept and inputs are never upscaled, so vertical or
+    smaller sources pass through sensibly. Returns the even output size, or
+    None when no scaling is needed or the input size is unknown.
+    """
+    if not box or not (width and height):
+        return None
+    factor = min(box[0] / width, box[1] / height)
+    if factor >= 1:
+        return None
+    return max(round(width * factor / 2) * 2, 2), max(round(height * factor / 2) * 2, 2)
+
+def compile_software_options(profile):
+    """Translates a profile's NVENC settings into the nearest x264/x265 options."""
+    options = ["-preset", SOFTWARE_PRESETS[profile["preset"]]]
+    if profile.get("tune") in ("ll", "ull"):
+        options.extend(["-tune", "zerolatency"])
+    if "cq" in profile:
+        # Capped CRF: quality-driven like NVENC VBR+CQ, held under maxrate
+        options.extend(["-crf", str(profile["cq"])])
+    else:
+        options.extend(["-b:v", profile["bitrate"]])
+    for key, flag in (("maxrate", "-maxrate"), ("bufsize", "-bufsize"), ("gop", "-g"), ("bframes", "-bf")):
+        if key in profile:
+            options.extend([flag, str(profile[key])])
+    return options
+
+def get_video_args(profile, encoder_backend, codec):
+    """Returns the compiled encoder arguments for "nvenc" or "software" encoding."""
+    if encoder_backend == "software":
+        return profile["software_video_args"][codec]
+    return profile["video_args"][codec]
+
+def compile_profile(name, profile):
+    """Compiles a validated profile into per-codec video argument templates."""
+    options = []
+    for key, flag, _ in PROFILE_OPTIONS:
+        if key in profile:
+            value = profile[key]
+            options.extend([flag, ("1" if value else "0") if isinstance(value, bool) else str(value)])
+    software_options = compile_software_options(profile)
+    return {
+        "name": name,
+        "description": profile.get("description", ""),
+        "video_args": {
+            codec: ("-c:v", encoder, *options) for codec, encoder in ENCODERS.items()
+        },
+        "software_video_args": {
+            codec: ("-c:v", encoder, *software_options) for codec, encoder in SOFTWARE_ENCODERS.items()
+        },
+        "bitrate_bps": parse_bitrate(profile["bitrate"]),
+        "maxrate_bps": parse_bitrate(profile["maxrate"]) if "maxrate" in profile else None,
+        "cq_range": (profile.get("qmin", 0), profile.get("qmax", 51)),
+        "scale": tuple(profile["scale"]) if profile.get("scale") else None,
+    }
+
+def read_profiles_file(path):
+    with open(path, "rb") as f:
+        if path.endswith(".toml"):
+            import tomllib  # Python 3.11+
+            return tomllib.load(f)
+        return json.load(f)
+
+def load_profiles(path=PROFILES_PATH):
+    """Loads, validates and compiles every profile in the file.
+
+    Raises ValueError listing every problem found, so a bad file is reported
+    once at startup rather than failing job by job.
+    """
+    try:
+        raw = read_profiles_file(path)
+    except (OSError, ValueError, ImportError) as e:
+        raise ValueError(f"Could not read profiles from {path}: {e}")
+    if not isinstance(raw, dict) or not raw:
+        raise ValueError(f"{path} must define at least one profile")
+    problems = []
+    for name, profile in raw.items():
+        problems.extend(validate_profile(name, profile))
+    if problems:
+        raise ValueError(f"Invalid profiles in {path}:\n" + "\n".join(problems))
+    return {name: compile_profile(name, profile) for name, profile in raw.items()}
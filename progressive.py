@@ -0,0 +1,96 @@
+import os
+import shutil
+
+# ======== Progressive Output ========
+#
+#   file - one monolithic file; mp4/mov get +faststart, which rewrites the
+#          whole output once more at the end to move the index to the front
+#   fmp4 - fragmented MP4: an empty moov up front and a fragment per keyframe,
+#          so the file plays while it is still being written and there is no
+#          final rewrite pass
+#   hls  - HLS event playlist of fMP4 segments in a folder of its own; players
+#          pick up new segments as they land
+
+OUTPUT_MODES = ("file", "fmp4", "hls")
+DEFAULT_OUTPUT_MODE = "file"
+
+HLS_SEGMENT_SECONDS = 6
+HLS_PLAYLIST = "index.m3u8"
+HLS_INIT_SEGMENT = "init.mp4"
+HLS_SEGMENT_PATTERN = "seg_%05d.m4s"
+
+FRAGMENTED_MOVFLAGS = "+frag_keyframe+empty_moov+default_base_moof"
+
+# Format menu values (also the file extension) whose ffmpeg muxer has another name
+MUXER_NAMES = {"mkv": "matroska"}
+
+def get_output_path(folder, base_name, output_format, mode):
+    """Returns where ffmpeg writes: a file, or the playlist inside an HLS folder."""
+    if mode == "hls":
+        return os.path.join(folder, f"{base_name}_hls", HLS_PLAYLIST)
+    if mode == "fmp4" and output_format not in ("mp4", "mov"):
+        # Fragmentation is an ISO-BMFF feature; fall back to mp4
+        output_format = "mp4"
+    return os.path.join(folder, f"{base_name}.{output_format}")
+
+def muxer_args(mode, output_format, output_path):
+    """Output format arguments for the given mode, placed just before the output path."""
+    if mode == "hls":
+        segment_folder = os.path.dirname(output_path)
+        return [
+            "-f", "hls",
+            "-hls_time", str(HLS_SEGMENT_SECONDS),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", HLS_INIT_SEGMENT,
+            "-hls_segment_filename", os.path.join(segment_folder, HLS_SEGMENT_PATTERN),
+            "-hls_flags", "independent_segments",
+        ]
+    if mode == "fmp4":
+        return ["-f", "mp4" if output_format not in ("mp4", "mov") else output_format, "-movflags", FRAGMENTED_MOVFLAGS]
+    if output_format in ("mp4", "mov"):
+        return ["-f", output_format, "-movflags", "+faststart"]
+    return ["-f", MUXER_NAMES.get(output_format, output_format)]
+
+def prepare_output(output_path, mode):
+    if mode == "hls":
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+def is_segmented(output_path):
+    return output_path.endswith(".m3u8")
+
+def output_size(output_path):
+    """Bytes written so far: the file, or every segment next to an HLS playlist."""
+    try:
+        if is_segmented(output_path):
+            folder = os.path.dirname(output_path)
+            return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+        return os.path.getsize(output_path)
+    except OSError:
+        return 0
+
+def existing_outputs(output_path):
+    """Paths already present where a job will write: the file, or the HLS folder and its entries."""
+    if is_segmented(output_path):
+        folder = os.path.dirname(output_path)
+        try:
+            return {folder} | {entry.path for entry in os.scandir(folder)}
+        except OSError:
+            return set()
+    return {output_path} if os.path.exists(output_path) else set()
+
+def remove_output(output_path, keep=frozenset()):
+    """Removes what a failed job wrote, leaving every path in keep (from existing_outputs())."""
+    if is_segmented(output_path):
+        folder = os.path.dirname(output_path)
+        if folder not in keep:
+            shutil.rmtree(folder, ignore_errors=True)
+            return
+        try:
+            for entry in os.scandir(folder):
+                if entry.path not in keep and entry.is_file():
+                    os.remove(entry.path)
+        except OSError:
+            pass
+    elif output_path not in keep and os.path.exists(output_path):
+        os.remove(output_path)
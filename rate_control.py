@@ -0,0 +1,152 @@
+import os
+import math
+import json
+import tempfile
+import subprocess
+
+import tracing
+from resources import launch_ffmpeg
+
+# ======== Size-Targeted Rate Control ========
+#
+# Instead of a fixed bitrate ceiling for every input, a handful of short
+# samples spread across the input are encoded at two CQ values. Bitrate is
+# close to exponential in CQ, so a straight line through ln(bitrate) gives a
+# model we can solve for the CQ that lands on the requested budget, which the
+# single final pass then uses.
+
+SAMPLE_COUNT = 3
+SAMPLE_SECONDS = 4
+SAMPLE_CQS = (18, 30)
+# Lowest CQ a plan may pick. Below the lower sample the model is only
+# extrapolated, and CQ 0 means "off" to NVENC and lossless as x264/x265 CRF
+CQ_FLOOR = SAMPLE_CQS[0] - 4
+# Share of the budget kept back for container overhead
+CONTAINER_OVERHEAD = 0.01
+
+RATE_TARGET_MODES = ("none", "size_mb", "bpp")
+
+def probe_timing(file_path):
+    """Returns (duration_seconds, frames_per_second) of the first video stream."""
+    with tracing.span("ffprobe_timing", "probe", file=os.path.basename(file_path)):
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=r_frame_rate:format=duration", "-of", "json", file_path],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    info = json.loads(result.stdout)
+    duration = float(info.get("format", {}).get("duration", 0) or 0)
+    rate = (info.get("streams") or [{}])[0].get("r_frame_rate", "0/1")
+    num, _, den = rate.partition("/")
+    fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+    return duration, fps
+
+def target_video_bps(mode, value, duration, width, height, fps, audio_bps):
+    """Converts a size or bits-per-pixel budget into a video bitrate in bits/s."""
+    if value <= 0:
+        raise ValueError("Rate target budget must be greater than zero")
+    if mode == "size_mb":
+        total_bits = value * 8_000_000 * (1 - CONTAINER_OVERHEAD)
+        video_bps = total_bits / duration - audio_bps
+        if video_bps <= 0:
+            raise ValueError(f"{value} MB doesn't cover the audio track alone; raise the budget")
+        return video_bps
+    if mode == "bpp":
+        if not (width and height and fps):
+            raise ValueError("Resolution or frame rate unknown; cannot plan a bits-per-pixel target")
+        return max(value * width * height * fps, 1)
+    raise ValueError(f"Unknown rate target mode: {mode}")
+
+def sample_offsets(duration, count=SAMPLE_COUNT, length=SAMPLE_SECONDS):
+    """Start times of evenly spread samples, or a single sample for short inputs."""
+    if duration <= count * length * 2:
+        return [0.0], min(duration, length * count)
+    return [duration * (i + 1) / (count + 1) - length / 2 for i in range(count)], length
+
+def encode_sample(file_path, video_args, frame_path, offset, length, resource_class):
+    """Encodes one video-only sample through the job's frame path and returns its size in bytes."""
+    fd, sample_path = tempfile.mkstemp(suffix=".mp4", prefix="mediaremux_sample_")
+    os.close(fd)
+    command = ["ffmpeg", "-y", "-v", "error", *frame_path["input_args"],
+               "-ss", f"{offset:.3f}", "-t", f"{length:.3f}", "-i", file_path]
+    command.extend(video_args)
+    if frame_path["filter"]:
+        command.extend(["-vf", frame_path["filter"]])
+    command.extend(frame_path["pix_fmt_args"])
+    command.extend(["-an", "-f", "mp4", sample_path])
+    try:
+        process, _ = launch_ffmpeg(command, resource_class, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Sample encode failed: {stderr.decode(errors='replace')[-500:]}")
+        return os.path.getsize(sample_path)
+    finally:
+        if os.path.exists(sample_path):
+            os.remove(sample_path)
+
+def fit_cq(measurements, target_bps, qmin=0, qmax=51):
+    """Solves ln(bps) = a + b * cq through two (cq, bps) points for target_bps."""
+    (cq_lo, bps_lo), (cq_hi, bps_hi) = measurements
+    slope = (math.log(bps_hi) - math.log(bps_lo)) / (cq_hi - cq_lo)
+    if slope >= 0:
+        # Degenerate content (e.g. static screens): bitrate doesn't fall with CQ
+        return cq_lo
+    cq = cq_lo + (math.log(target_bps) - math.log(bps_lo)) / slope
+    return int(min(max(round(cq), qmin), qmax))
+
+def plan_rate_target(file_path, video_args, frame_path, mode, value, frame_size, audio_bps, resource_class, timing=None,
+                     cq_range=(0, 51)):
+    """Samples the input and returns encoder overrides that hit the budget.
+
+    The returned dict holds "overrides" (ffmpeg flag -> value, applied on top
+    of the profile) plus the prediction, for the job metrics. frame_size is
+    the (width, height) of the encoded frames, after any scaling, which is what
+    a bits-per-pixel budget counts. timing is a (duration, fps) pair from
+    probe_timing() when the caller already has one. cq_range is the
+    profile's (qmin, qmax); the plan never goes below CQ_FLOOR either.
+    """
+    width, height = frame_size
+    duration, fps = timing or probe_timing(file_path)
+    if duration <= 0:
+        raise ValueError("Input duration unknown; cannot plan a size target")
+    target_bps = target_video_bps(mode, value, duration, width, height, fps, audio_bps)
+
+    offsets, length = sample_offsets(duration)
+    measurements = []
+    for cq in SAMPLE_CQS:
+        # Uncapped VBR so CQ alone decides the sample size
+        args = override_video_args(video_args, {"-cq": str(cq), "-b:v": "0", "-maxrate": "0", "-bufsize": "0"})
+        total_bytes = 0
+        for offset in offsets:
+            with tracing.span("rate_sample", "rate", file=os.path.basename(file_path), cq=cq, offset=offset):
+                total_bytes += encode_sample(file_path, args, frame_path, offset, length, resource_class)
+        measurements.append((cq, max(total_bytes * 8 / (length * len(offsets)), 1)))
+
+    cq = fit_cq(measurements, target_bps, qmin=max(cq_range[0], CQ_FLOOR), qmax=cq_range[1])
+    slope = (math.log(measurements[1][1]) - math.log(measurements[0][1])) / (SAMPLE_CQS[1] - SAMPLE_CQS[0])
+    predicted_bps = math.exp(math.log(measurements[0][1]) + slope * (cq - SAMPLE_CQS[0]))
+    return {
+        "overrides": {
+            "-cq": str(cq),
+            "-b:v": str(int(target_bps)),
+            "-maxrate": str(int(target_bps * 1.5)),
+            "-bufsize": str(int(target_bps * 2)),
+        },
+        "cq": cq,
+        "target_bytes": int((target_bps + audio_bps) * duration / 8),
+        "predicted_bytes": int((predicted_bps + audio_bps) * duration / 8),
+        "samples": [{"cq": q, "bps": int(bps)} for q, bps in measurements],
+    }
+
+def override_video_args(video_args, overrides):
+    """Returns a copy of a compiled argument list with flag values replaced or appended."""
+    args = list(video_args)
+    for flag, value in overrides.items():
+        if flag == "-cq" and "-crf" in args:
+            # Software encoders take the same quality scale as CRF
+            flag = "-crf"
+        if flag in args:
+            args[args.index(flag) + 1] = value
+        else:
+            args.extend([flag, value])
+    return args
@@ -0,0 +1,148 @@
+import os
+import sys
+import shutil
+import subprocess
+
+# ======== Resource Classes ========
+#
+# Each class describes how hard an ffmpeg child may lean on the workstation.
+#   nice          - POSIX nice increment (via `nice`; Windows maps it onto a priority class)
+#   ionice_class  - 1 realtime, 2 best-effort, 3 idle (Linux only, via `ionice`)
+#   ionice_level  - 0 (highest) .. 7 (lowest) within best-effort/realtime
+#   cpu_affinity  - list of CPU indexes (via `taskset`), or None to leave the scheduler alone
+#   cpu_weight    - cgroup v2 cpu.weight (1..10000, 100 is the kernel default)
+#   io_weight     - cgroup v2 io.weight (1..10000, 100 is the kernel default)
+#   threads       - decoder -threads and encoder -threads/-filter_threads, 0 = auto
+
+RESOURCE_CLASSES = {
+    "urgent": {
+        "nice": 0,
+        "ionice_class": 2,
+        "ionice_level": 0,
+        "cpu_affinity": None,
+        "cpu_weight": 1000,
+        "io_weight": 1000,
+        "threads": 0,
+    },
+    "normal": {
+        "nice": 5,
+        "ionice_class": 2,
+        "ionice_level": 4,
+        "cpu_affinity": None,
+        "cpu_weight": 100,
+        "io_weight": 100,
+        "threads": 0,
+    },
+    "background": {
+        "nice": 15,
+        "ionice_class": 3,
+        "ionice_level": 7,
+        "cpu_affinity": None,
+        "cpu_weight": 20,
+        "io_weight": 20,
+        "threads": max(1, (os.cpu_count() or 2) // 2),
+    },
+}
+
+DEFAULT_RESOURCE_CLASS = "normal"
+
+# Delegated cgroup v2 directory the current user may write to, e.g.
+# /sys/fs/cgroup/user.slice/user-1000.slice/user@1000.service/app.slice.
+# When unset, cpu_weight/io_weight are skipped and only nice/ionice apply.
+CGROUP_ROOT = os.environ.get("MEDIAREMUX_CGROUP_ROOT")
+
+IONICE_CLASS_NAMES = {1: "realtime", 2: "best-effort", 3: "idle"}
+
+def get_resource_class(name):
+    """Returns a copy of the named resource class, raising ValueError if unknown."""
+    if name not in RESOURCE_CLASSES:
+        raise ValueError(f"Unknown resource class: {name}")
+    resource_class = dict(RESOURCE_CLASSES[name])
+    resource_class["name"] = name
+    return resource_class
+
+def apply_thread_cap(command, resource_class):
+    """Caps decoder, filter and encoder threads when the class sets a limit.
+
+    -threads before -i limits the decoder, which is most of the CPU load on
+    the CPU-decode paths; after it, -threads/-filter_threads go ahead of the
+    output path for the encoder and filters.
+    """
+    threads = resource_class.get("threads") or 0
+    if threads <= 0:
+        return command
+    command = command[:-1] + ["-threads", str(threads), "-filter_threads", str(threads), command[-1]]
+    if "-i" in command:
+        index = command.index("-i")
+        command = command[:index] + ["-threads", str(threads)] + command[index:]
+    return command
+
+def _windows_priority_flag(nice):
+    if nice >= 15:
+        return subprocess.IDLE_PRIORITY_CLASS
+    if nice > 0:
+        return subprocess.BELOW_NORMAL_PRIORITY_CLASS
+    if nice < 0:
+        return subprocess.ABOVE_NORMAL_PRIORITY_CLASS
+    return subprocess.NORMAL_PRIORITY_CLASS
+
+def _attach_cgroup(pid, resource_class, applied):
+    if not CGROUP_ROOT:
+        return
+    group = os.path.join(CGROUP_ROOT, f"mediaremux-{resource_class['name']}")
+    try:
+        os.makedirs(group, exist_ok=True)
+        for key, control in (("cpu_weight", "cpu.weight"), ("io_weight", "io.weight")):
+            if resource_class.get(key):
+                with open(os.path.join(group, control), "w") as f:
+                    f.write(str(resource_class[key]))
+                applied[key] = resource_class[key]
+        with open(os.path.join(group, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+        applied["cgroup"] = group
+    except OSError as e:
+        applied["cgroup_error"] = str(e)
+
+def launch_ffmpeg(command, resource_class, **popen_kwargs):
+    """Starts an ffmpeg child under the given resource class.
+
+    Returns (process, applied) where applied records the limits that actually
+    took effect on this platform, for display in the job metrics.
+    """
+    command = apply_thread_cap(list(command), resource_class)
+    nice = resource_class.get("nice", 0)
+    cpu_affinity = resource_class.get("cpu_affinity")
+    applied = {"resource_class": resource_class["name"]}
+    if resource_class.get("threads"):
+        applied["threads"] = resource_class["threads"]
+
+    if sys.platform == "win32":
+        popen_kwargs["creationflags"] = popen_kwargs.get("creationflags", 0) | _windows_priority_flag(nice)
+        applied["priority"] = nice
+    else:
+        # nice, ionice and taskset each exec the next command in place, so the
+        # pid stays the ffmpeg pid and no Python code runs between fork and
+        # exec (preexec_fn is unsafe with several worker threads spawning)
+        prefix = []
+        if nice and shutil.which("nice"):
+            prefix.extend(["nice", "-n", str(nice)])
+            applied["nice"] = nice
+        ionice_class = resource_class.get("ionice_class")
+        if ionice_class and sys.platform.startswith("linux") and shutil.which("ionice"):
+            prefix.extend(["ionice", "-c", str(ionice_class)])
+            if ionice_class != 3:
+                prefix.extend(["-n", str(resource_class.get("ionice_level", 4))])
+            applied["ionice"] = IONICE_CLASS_NAMES.get(ionice_class, str(ionice_class))
+        if cpu_affinity and shutil.which("taskset"):
+            prefix.extend(["taskset", "-c", ",".join(str(cpu) for cpu in cpu_affinity)])
+            applied["cpu_affinity"] = list(cpu_affinity)
+        command = prefix + command
+
+    process = subprocess.Popen(command, **popen_kwargs)
+    if sys.platform.startswith("linux"):
+        _attach_cgroup(process.pid, resource_class, applied)
+    return process, applied
+
+def format_applied_limits(applied):
+    """Formats the applied limits as a short single-line summary."""
+    return " ".join(f"{key}={value}" for key, value in applied.items())
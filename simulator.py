@@ -0,0 +1,531 @@
+import io
+import os
+import json
+import time
+import queue
+import shutil
+import argparse
+import contextlib
+import tempfile
+import threading
+import subprocess
+from unittest import mock
+
+import main
+import tracing
+from io_lanes import DeviceLanes
+from admission import SpaceReservations
+from profiles import load_profiles, DEFAULT_PROFILE
+from frame_path import SIMULATED_CAPABILITIES
+
+# ======== Scheduler Simulator ========
+#
+# Replays a list of jobs through the real worker code (process_queue,
+# remux_video, process_verify_queue, device lanes, disk admission) with the
+# ffmpeg/ffprobe subprocesses replaced by a fake. The fake emits progress
+# lines, writes sparse output files of a realistic size and can fail or stall
+# on demand. Time is compressed: one simulated second takes time_scale real
+# seconds, and all reported figures are in simulated seconds.
+#
+# Encode speed is shared: NVENC sessions beyond gpu_slots split the GPU, and
+# jobs reading the same device slow each other down by its seek_penalty, so
+# ordering and concurrency policies show up in the makespan.
+#
+#     python simulator.py jobs.json
+#     python simulator.py --from-trace trace.json --workers 3
+#
+# jobs.json holds {"workers", "device_limit", "time_scale", "gpu_slots",
+# "devices": {name: {"streams", "seek_penalty"}}, "settings": {...},
+# "jobs": [{"name", "device", "arrival", "duration", "speed", "width",
+# "height", "codec", "pix_fmt", "fail", "stall"}]}. Only "jobs" is required.
+
+DEFAULT_CONFIG = {
+    "workers": 2,
+    "device_limit": 1,
+    "time_scale": 0.001,
+    "gpu_slots": 3,
+    "devices": {},
+    "settings": {},
+    "timeout": 24 * 3600,
+}
+DEFAULT_JOB = {
+    "device": "local",
+    "arrival": 0.0,
+    "duration": 600.0,
+    "speed": 4.0,
+    "width": 1920,
+    "height": 1080,
+    "fps": 60,
+    "codec": "h264",
+    "pix_fmt": "yuv420p",
+    "bitrate": 20_000_000,
+    "startup_seconds": 1.5,
+    "finalize_seconds": 2.0,
+    "probe_seconds": 0.2,
+    "fail": False,
+    "stall": False,
+    "stall_seconds": None,
+}
+DEFAULT_DEVICE = {"streams": 1, "seek_penalty": 0.0}
+OUTPUT_DEVICE = "output"
+TICK_SECONDS = 0.002
+
+def default_job_settings(**overrides):
+    """The settings RemuxTool.enqueue_file would snapshot with the GUI defaults."""
+    settings = {
+        "resource_class": "normal",
+        "profile": DEFAULT_PROFILE,
+        "downscale": False,
+        "scale": (1920, 1080),
+        "output_format": "mp4",
+        "output_mode": "file",
+        "backend": "auto",
+        "audio_codec": "aac",
+        "audio_bitrate": 192,
+        "audio_sample_rate": 48000,
+        "audio_channels": 2,
+        "rate_target_mode": "none",
+        "rate_target_value": 0.0,
+        "verify_level": "container",
+    }
+    settings.update(overrides)
+    return settings
+
+class SimClock:
+    def __init__(self, time_scale):
+        self.time_scale = time_scale
+        self.origin = time.perf_counter()
+
+    def now(self):
+        return (time.perf_counter() - self.origin) / self.time_scale
+
+    def sleep(self, seconds):
+        time.sleep(max(seconds, 0) * self.time_scale)
+
+class LineStream:
+    """Text stderr that yields lines as the fake process produces them."""
+    def __init__(self):
+        self.lines = queue.Queue()
+
+    def put(self, line):
+        self.lines.put(line)
+
+    def close(self):
+        self.lines.put(None)
+
+    def __iter__(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                return
+            yield line
+
+class FakeProcess:
+    _next_pid = 100000
+
+    def __init__(self, fake, command, job, kind, output_path, text):
+        FakeProcess._next_pid += 1
+        self.pid = FakeProcess._next_pid
+        self.fake = fake
+        self.command = command
+        self.job = job
+        self.kind = kind
+        self.output_path = output_path
+        self.text = text
+        self.returncode = None
+        self.stderr = LineStream() if text else None
+        self.stdout = None
+        self.error_output = ""
+        self.terminated = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def emit(self, line):
+        if self.text:
+            self.stderr.put(line + "\n")
+        else:
+            self.error_output += line + "\n"
+
+    def run(self):
+        try:
+            self.returncode = self.fake.execute(self)
+        finally:
+            if self.text:
+                self.stderr.close()
+            self.done.set()
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.returncode
+
+    def poll(self):
+        return self.returncode if self.done.is_set() else None
+
+    def communicate(self, input=None, timeout=None):
+        self.wait(timeout)
+        error_output = self.error_output if self.text else self.error_output.encode()
+        return (None, error_output)
+
+    def terminate(self):
+        self.terminated.set()
+
+    kill = terminate
+
+class FakeFFmpeg:
+    def __init__(self, config, clock, jobs_by_input):
+        self.config = config
+        self.clock = clock
+        self.jobs_by_input = jobs_by_input
+        self.jobs_by_output = {}
+        self.devices = config["devices"]
+        self.lock = threading.Lock()
+        self.active_encodes = []
+        self.events = []
+
+    def record(self, job, event):
+        with self.lock:
+            self.events.append((self.clock.now(), job["name"] if job else None, event))
+
+    def job_for(self, path):
+        return self.jobs_by_input.get(path) or self.jobs_by_output.get(path)
+
+    def probe_json(self, job):
+        return json.dumps({
+            "streams": [
+                {"codec_type": "video", "width": job["width"], "height": job["height"],
+                 "codec_name": job["codec"], "pix_fmt": job["pix_fmt"], "r_frame_rate": f"{job['fps']}/1"},
+                {"codec_type": "audio", "codec_name": "aac"},
+            ],
+            "format": {"duration": str(job["duration"])},
+        }).encode()
+
+    def run(self, command, check=False, stdout=None, stderr=None, **kwargs):
+        path = command[-1]
+        job = self.job_for(path)
+        if command[0] != "ffprobe" or job is None:
+            result = subprocess.CompletedProcess(command, 1, b"", b"simulated: unknown command or path")
+        else:
+            if path in self.jobs_by_input:
+                self.record(job, "probe")
+            self.clock.sleep(job["probe_seconds"])
+            result = subprocess.CompletedProcess(command, 0, self.probe_json(job), b"")
+        if check and result.returncode:
+            raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+        return result
+
+    def popen(self, command, **kwargs):
+        # Skip wrappers such as ionice in front of ffmpeg
+        command = command[next(i for i, arg in enumerate(command) if os.path.basename(arg).startswith("ffmpeg")):]
+        input_path = command[command.index("-i") + 1]
+        output_path = command[-1]
+        text = bool(kwargs.get("universal_newlines") or kwargs.get("text"))
+        if output_path == "-":
+            kind = "decode"
+        elif "-an" in command:
+            kind = "sample"
+        else:
+            kind = "encode"
+        job = self.job_for(input_path)
+        if kind == "encode" and job is not None:
+            self.jobs_by_output[output_path] = job
+        return FakeProcess(self, command, job, kind, output_path, text)
+
+    def speed_factor(self, process):
+        """Fraction of full speed given the encodes currently sharing GPU and disk."""
+        with self.lock:
+            active = list(self.active_encodes)
+        gpu_slots = self.config["gpu_slots"]
+        gpu_factor = max(1.0, len(active) / gpu_slots)
+        device = process.job["device"]
+        spec = {**DEFAULT_DEVICE, **self.devices.get(device, {})}
+        sharing = sum(1 for other in active if other.job["device"] == device)
+        disk_factor = max(1.0, sharing / spec["streams"]) * (1 + spec["seek_penalty"] * max(sharing - 1, 0))
+        return 1.0 / (gpu_factor * disk_factor)
+
+    def execute(self, process):
+        job = process.job
+        if job is None:
+            process.emit("simulated: unknown input")
+            return 1
+        if process.kind == "decode":
+            self.clock.sleep(0.5 if "-frames:v" in process.command else job["duration"] / (job["speed"] * 4))
+            return 0
+        if process.kind == "sample":
+            seconds = float(process.command[process.command.index("-t") + 1])
+            cq = int(process.command[process.command.index("-cq") + 1]) if "-cq" in process.command else 19
+            self.clock.sleep(seconds / job["speed"])
+            # Bitrate halves roughly every 6 CQ steps around the job's nominal rate at CQ 19
+            write_sparse(process.output_path, int(job["bitrate"] * 2 ** ((19 - cq) / 6) * seconds / 8))
+            return 0
+        return self.execute_encode(process)
+
+    def execute_encode(self, process):
+        job = process.job
+        self.record(job, "spawn")
+        self.clock.sleep(job["startup_seconds"])
+        with self.lock:
+            self.active_encodes.append(process)
+        try:
+            fail_at = job["duration"] * 0.5 if job["fail"] else None
+            stall_at = job["duration"] * 0.3 if job["stall"] else None
+            position = 0.0
+            last_report = -1.0
+            last_tick = self.clock.now()
+            while position < job["duration"]:
+                if process.terminated.is_set():
+                    return -15
+                if stall_at is not None and position >= stall_at:
+                    self.record(job, "stall")
+                    stalled_until = None if job["stall_seconds"] is None else self.clock.now() + job["stall_seconds"]
+                    while not process.terminated.is_set():
+                        if stalled_until is not None and self.clock.now() >= stalled_until:
+                            break
+                        time.sleep(TICK_SECONDS)
+                    process.emit("simulated: stalled input")
+                    return -15 if process.terminated.is_set() else 1
+                if fail_at is not None and position >= fail_at:
+                    process.emit("simulated: encoder error")
+                    return 1
+                # Advance by the simulated time that actually passed, so sleep
+                # overshoot and bookkeeping don't count as extra encode time
+                now = self.clock.now()
+                elapsed, last_tick = now - last_tick, now
+                # A fast job (e.g. replayed from a trace) can cover the whole
+                # input in one tick; don't step over its fail or stall point
+                stops = [point for point in (stall_at, fail_at) if point is not None and point > position]
+                position = min([position + elapsed * job["speed"] * self.speed_factor(process), *stops])
+                if position - last_report >= job["duration"] / 50:
+                    last_report = position
+                    process.emit(f"frame={int(position * job['fps'])} fps=0 q=19.0 size=0kB time={position:.2f} bitrate=N/A speed=N/A")
+                    write_sparse(process.output_path, int(job["bitrate"] * min(position, job["duration"]) / 8))
+                time.sleep(TICK_SECONDS)
+        finally:
+            with self.lock:
+                if process in self.active_encodes:
+                    self.active_encodes.remove(process)
+        self.clock.sleep(job["finalize_seconds"])
+        write_sparse(process.output_path, int(job["bitrate"] * job["duration"] / 8))
+        self.record(job, "encoded")
+        return 0
+
+def write_sparse(path, size):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "ab") as f:
+        f.truncate(size)
+
+class SimulatedLanes(DeviceLanes):
+    """Device lanes keyed by the simulated device of each path instead of st_dev."""
+    def __init__(self, device_of, default_limit, write_limit):
+        super().__init__(default_limit=default_limit, overrides={}, write_limit=write_limit)
+        self.device_of = device_of
+
+    def resolve_device(self, path):
+        device = self.device_of(path)
+        self.mounts.setdefault(device, device)
+        return device
+
+class SimulatedApp:
+    """The subset of RemuxTool the worker functions use, without Tk."""
+    def __init__(self, config, work_dir, device_of):
+        self.codec_support = "hevc"
+        self.capabilities = SIMULATED_CAPABILITIES["full-cuda"]
+        self.profiles = load_profiles()
+        self.output_folder = os.path.join(work_dir, "out")
+        os.makedirs(self.output_folder, exist_ok=True)
+        self.remux_queue = queue.Queue()
+        self.output_queue = queue.Queue()
+        self.verify_queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.transcoding_processes = {}
+        self.job_options = {}
+        self.job_metrics = {}
+        self.device_lanes = SimulatedLanes(device_of, config["device_limit"], config["workers"])
+        self.space_reservations = SpaceReservations(headroom=0)
+
+def trace_read_device(devices):
+    """Picks the input device out of a job span's "read /mnt/a, write /mnt/b" devices arg."""
+    entries = [entry.strip() for entry in devices.split(",") if entry.strip()]
+    for entry in entries:
+        if entry.startswith("read "):
+            return entry[len("read "):]
+    # Traces from before read/write lanes list bare mount points; take the first
+    return entries[0] if entries else None
+
+def load_jobs_from_trace(path):
+    """Builds a job list from a MEDIAREMUX_TRACE Chrome trace.
+
+    Arrival comes from each file's queue_wait span, and encode speed from its
+    encode span assuming the recorded encode covered the whole input. The
+    job span gives the device the input was read from and whether ffmpeg
+    failed.
+    """
+    with open(path) as f:
+        events = json.load(f)["traceEvents"]
+    jobs = {}
+    for event in events:
+        name = event.get("args", {}).get("file")
+        if event.get("ph") != "X" or not name:
+            continue
+        job = jobs.setdefault(name, {"name": name})
+        seconds = event["dur"] / 1_000_000
+        if event["name"] == "queue_wait":
+            job["arrival"] = event["ts"] / 1_000_000
+        elif event["name"] == "encoder_startup":
+            job["startup_seconds"] = seconds
+        elif event["name"] == "encode":
+            job["encode_seconds"] = seconds
+        elif event["name"] == "finalize_output":
+            job["finalize_seconds"] = seconds
+        elif event["name"] == "ffprobe":
+            job["probe_seconds"] = seconds
+        elif event["name"] == "job":
+            device = trace_read_device(event["args"].get("devices", ""))
+            if device:
+                job["device"] = device
+            job["fail"] = event["args"].get("status") == "failed"
+    start = min((job.get("arrival", 0.0) for job in jobs.values()), default=0.0)
+    for job in jobs.values():
+        job["arrival"] = job.get("arrival", start) - start
+        if "encode_seconds" in job:
+            job["speed"] = job.get("duration", DEFAULT_JOB["duration"]) / max(job.pop("encode_seconds"), 1e-3)
+    return list(jobs.values())
+
+def run_simulation(config):
+    """Runs the jobs in config through the real worker code and returns a report dict."""
+    config = {**DEFAULT_CONFIG, **config}
+    jobs = [{**DEFAULT_JOB, **job} for job in config["jobs"]]
+    work_dir = tempfile.mkdtemp(prefix="mediaremux_sim_")
+    clock = SimClock(config["time_scale"])
+    try:
+        jobs_by_input = {}
+        for index, job in enumerate(jobs):
+            job.setdefault("name", f"job{index}.mp4")
+            job["path"] = os.path.join(work_dir, "in", job["device"], job["name"])
+            write_sparse(job["path"], int(job["bitrate"] * job["duration"] / 8))
+            jobs_by_input[job["path"]] = job
+
+        def device_of(path):
+            job = jobs_by_input.get(path)
+            return job["device"] if job else OUTPUT_DEVICE
+
+        app = SimulatedApp(config, work_dir, device_of)
+        fake = FakeFFmpeg(config, clock, jobs_by_input)
+        # The worker code echoes every command and progress line; keep the report readable
+        with mock.patch("subprocess.run", fake.run), mock.patch("subprocess.Popen", fake.popen), \
+                contextlib.redirect_stdout(io.StringIO()):
+            return simulate(config, jobs, app, fake, clock)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def simulate(config, jobs, app, fake, clock):
+    workers = [
+        threading.Thread(target=main.process_queue, args=(app.remux_queue, app.output_queue, app.stop_event, app),
+                         name=f"remux-worker-{index}", daemon=True)
+        for index in range(config["workers"])
+    ]
+    workers.append(threading.Thread(target=main.process_verify_queue, args=(app.verify_queue, app.output_queue, app.stop_event, app),
+                                    name="verify-worker", daemon=True))
+    for thread in workers:
+        thread.start()
+
+    # Start the simulated clock once the workers are up so arrivals line up
+    clock.origin = time.perf_counter()
+
+    def feed():
+        for job in sorted(jobs, key=lambda job: job["arrival"]):
+            clock.sleep(job["arrival"] - clock.now())
+            app.job_options[job["path"]] = {**default_job_settings(**config["settings"]), "queued_at": tracing.now()}
+            job["queued"] = clock.now()
+            app.remux_queue.put(job["path"])
+            # Wake workers waiting on busy lanes so the new job is considered immediately
+            with app.device_lanes.condition:
+                app.device_lanes.condition.notify_all()
+
+    threading.Thread(target=feed, daemon=True).start()
+
+    finished = {}
+    statuses = {}
+    deadline = config["timeout"]
+    while len(finished) < len(jobs) and clock.now() < deadline:
+        try:
+            file_path, _, status = app.output_queue.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        if status == "Success" or status.startswith("Error:"):
+            finished[file_path] = clock.now()
+            statuses[file_path] = "ok" if status == "Success" else status.splitlines()[0][:60]
+    if len(finished) < len(jobs):
+        # Stalled jobs never finish on their own; stop them like the Stop button
+        for process in list(app.transcoding_processes.values()):
+            process.terminate()
+    app.stop_event.set()
+    return build_report(config, jobs, fake, finished, statuses)
+
+def build_report(config, jobs, fake, finished, statuses):
+    first_event = {}
+    encode_spans = {}
+    for at, name, event in fake.events:
+        first_event.setdefault(name, at)
+        if event == "spawn":
+            encode_spans[name] = [at, None]
+        elif event == "encoded" and name in encode_spans:
+            encode_spans[name][1] = at
+
+    rows = []
+    for job in jobs:
+        started = first_event.get(job["name"])
+        ended = finished.get(job["path"])
+        rows.append({
+            "name": job["name"],
+            "device": job["device"],
+            "arrival": job["queued"] if "queued" in job else job["arrival"],
+            "wait": started - job.get("queued", job["arrival"]) if started is not None else None,
+            "finished": ended,
+            "status": statuses.get(job["path"], "unfinished"),
+        })
+    arrivals = [row["arrival"] for row in rows]
+    ends = [row["finished"] for row in rows if row["finished"] is not None]
+    makespan = (max(ends) - min(arrivals)) if ends else 0.0
+    waits = [row["wait"] for row in rows if row["wait"] is not None]
+    busy = sum(end - start for start, end in encode_spans.values() if end is not None)
+    return {
+        "jobs": rows,
+        "makespan": makespan,
+        "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+        "utilization": busy / (config["workers"] * makespan) if makespan else 0.0,
+        "failed": sum(1 for row in rows if row["status"] != "ok"),
+    }
+
+def print_report(report):
+    print(f"{'job':30} {'device':10} {'arrival':>9} {'wait':>9} {'finished':>9}  status")
+    for row in report["jobs"]:
+        wait = f"{row['wait']:9.1f}" if row["wait"] is not None else f"{'-':>9}"
+        done = f"{row['finished']:9.1f}" if row["finished"] is not None else f"{'-':>9}"
+        print(f"{row['name'][:30]:30} {row['device'][:10]:10} {row['arrival']:9.1f} {wait} {done}  {row['status']}")
+    print(f"\nmakespan    {report['makespan']:.1f}s")
+    print(f"mean wait   {report['mean_wait']:.1f}s")
+    print(f"utilization {report['utilization'] * 100:.1f}% of worker time encoding")
+    print(f"failed      {report['failed']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay jobs through the worker code with a fake ffmpeg.")
+    parser.add_argument("config", nargs="?", help="JSON file with jobs and scheduler settings")
+    parser.add_argument("--from-trace", help="Chrome trace written with MEDIAREMUX_TRACE to replay")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--device-limit", type=int)
+    parser.add_argument("--time-scale", type=float)
+    args = parser.parse_args()
+    if not args.config and not args.from_trace:
+        parser.error("a config file or --from-trace is required")
+
+    config = {}
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    if args.from_trace:
+        config["jobs"] = load_jobs_from_trace(args.from_trace)
+    for key in ("workers", "device_limit", "time_scale"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    print_report(run_simulation(config))
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from collections import namedtuple
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import SpaceReservations
+
+DiskUsage = namedtuple("DiskUsage", "total used free")
+
+class ReservationTests(unittest.TestCase):
+    def setUp(self):
+        self.output_path = os.path.join(tempfile.gettempdir(), "mediaremux_test_output.mp4")
+        self.usage = mock.patch("admission.shutil.disk_usage", return_value=DiskUsage(1000, 900, 100))
+        self.usage.start()
+
+    def tearDown(self):
+        self.usage.stop()
+
+    def test_reservations_share_free_space(self):
+        reservations = SpaceReservations(headroom=0)
+        stop_event = threading.Event()
+        self.assertTrue(reservations.reserve("a", self.output_path, 60, stop_event))
+        self.assertEqual(reservations.usage("a"), (60, 0))
+        waiting = threading.Thread(target=reservations.reserve, args=("b", self.output_path, 60, stop_event))
+        waiting.start()
+        waiting.join(0.2)
+        self.assertTrue(waiting.is_alive())
+        reservations.release("a")
+        waiting.join(2)
+        self.assertFalse(waiting.is_alive())
+        self.assertEqual(reservations.usage("b"), (60, 0))
+
+    def test_cancel_waiting_releases_blocked_jobs(self):
+        reservations = SpaceReservations(headroom=0)
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(
+            reservations.reserve("big", self.output_path, 500, threading.Event())))
+        waiting.start()
+        waiting.join(0.2)
+        reservations.cancel_waiting()
+        waiting.join(2)
+        self.assertEqual(results, [False])
+        self.assertEqual(reservations.usage("big"), (0, 0))
+
+    def test_estimate_larger_than_disk_is_rejected(self):
+        with self.assertRaises(ValueError):
+            SpaceReservations(headroom=0).reserve("huge", self.output_path, 2000, threading.Event())
+
+if __name__ == "__main__":
+    unittest.main()
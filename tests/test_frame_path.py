@@ -0,0 +1,106 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiles import load_profiles
+from frame_path import SIMULATED_CAPABILITIES
+from ffmpeg_command import build_ffmpeg_command
+
+# Golden ffmpeg commands for each simulated ffmpeg build, so frame-path
+# changes show up as explicit diffs here rather than on someone's GPU.
+
+PROFILES = load_profiles()
+
+SETTINGS = {
+    "profile": "edit-proxy",
+    "downscale": False,
+    "scale": (1920, 1080),
+    "output_format": "mp4",
+    "output_mode": "file",
+    "backend": "auto",
+    "audio_codec": "aac",
+    "audio_bitrate": 192,
+    "audio_sample_rate": 48000,
+    "audio_channels": 2,
+}
+
+UHD_420 = (3840, 2160, "h264", "yuv420p")
+UHD_422 = (3840, 2160, "h264", "yuv422p")
+
+INPUT = ["-thread_queue_size", "1024", "-i", "in.mkv"]
+NVENC_PROXY = [
+    "-c:v", "hevc_nvenc", "-preset", "p1", "-tune", "ll", "-rc", "vbr", "-cq", "23", "-qmin", "1", "-qmax", "51",
+    "-b:v", "10M", "-maxrate", "15M", "-bufsize", "20M", "-spatial-aq", "0", "-temporal-aq", "0",
+    "-refs", "1", "-g", "30", "-bf", "0",
+]
+X265_PROXY = [
+    "-c:v", "libx265", "-preset", "ultrafast", "-tune", "zerolatency", "-crf", "23",
+    "-maxrate", "15M", "-bufsize", "20M", "-g", "30", "-bf", "0",
+]
+AUDIO_AND_MUXER = ["-c:a", "aac", "-b:a", "192k", "-ar", "48000", "-ac", "2", "-f", "mp4", "-movflags", "+faststart"]
+MAPS = ["-map_metadata", "0", "-map", "0:v", "-map", "0:a"]
+
+def command_for(build, probe, **settings):
+    app = SimpleNamespace(profiles=PROFILES, capabilities=SIMULATED_CAPABILITIES[build], codec_support="hevc")
+    return build_ffmpeg_command(app, "in.mkv", "out.mp4", {**SETTINGS, **settings}, probe)
+
+class FrameCommandTests(unittest.TestCase):
+    def test_full_cuda_keeps_frames_on_gpu(self):
+        self.assertEqual(command_for("full-cuda", UHD_420), [
+            "ffmpeg", "-n", "-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-extra_hw_frames", "3",
+            *INPUT, *NVENC_PROXY, *AUDIO_AND_MUXER, *MAPS,
+            "-vf", "scale_cuda=1920:1080:format=nv12", "out.mp4",
+        ])
+
+    def test_full_cuda_uploads_sources_nvdec_cannot_decode(self):
+        # 4:2:2 H.264 falls outside NVDEC; decode on the CPU and upload once
+        self.assertEqual(command_for("full-cuda", UHD_422), [
+            "ffmpeg", "-n", "-init_hw_device", "cuda=cu", "-filter_hw_device", "cu",
+            *INPUT, *NVENC_PROXY, *AUDIO_AND_MUXER, *MAPS,
+            "-vf", "format=nv12,hwupload_cuda,scale_cuda=1920:1080:format=nv12", "out.mp4",
+        ])
+
+    def test_without_scale_cuda_scales_on_cpu(self):
+        self.assertEqual(command_for("nvenc-without-scale_cuda", UHD_420), [
+            "ffmpeg", "-n", "-hwaccel", "cuda",
+            *INPUT, *NVENC_PROXY, *AUDIO_AND_MUXER, "-pix_fmt", "yuv420p", *MAPS,
+            "-vf", "scale=1920:1080", "out.mp4",
+        ])
+
+    def test_cpu_decode_uploads_once(self):
+        self.assertEqual(command_for("nvenc-without-nvdec", UHD_420), [
+            "ffmpeg", "-n", "-init_hw_device", "cuda=cu", "-filter_hw_device", "cu",
+            *INPUT, *NVENC_PROXY, *AUDIO_AND_MUXER, *MAPS,
+            "-vf", "format=nv12,hwupload_cuda,scale_cuda=1920:1080:format=nv12", "out.mp4",
+        ])
+
+    def test_software_only(self):
+        self.assertEqual(command_for("cpu-only", UHD_420), [
+            "ffmpeg", "-n",
+            *INPUT, *X265_PROXY, *AUDIO_AND_MUXER, "-pix_fmt", "yuv420p", *MAPS,
+            "-vf", "scale=1920:1080", "out.mp4",
+        ])
+
+    def test_software_backend_forced_on_cuda_build(self):
+        self.assertEqual(command_for("full-cuda", UHD_420, backend="software"), command_for("cpu-only", UHD_420))
+
+    def test_mkv_uses_matroska_muxer(self):
+        app = SimpleNamespace(profiles=PROFILES, capabilities=SIMULATED_CAPABILITIES["full-cuda"], codec_support="hevc")
+        command = build_ffmpeg_command(app, "in.mkv", "out.mkv", {**SETTINGS, "output_format": "mkv"}, UHD_420)
+        self.assertEqual(command, [
+            "ffmpeg", "-n", "-hwaccel", "cuda", "-hwaccel_output_format", "cuda", "-extra_hw_frames", "3",
+            *INPUT, *NVENC_PROXY, "-c:a", "aac", "-b:a", "192k", "-ar", "48000", "-ac", "2", "-f", "matroska", *MAPS,
+            "-vf", "scale_cuda=1920:1080:format=nv12", "out.mkv",
+        ])
+
+    def test_profile_scale_keeps_aspect_and_never_upscales(self):
+        vertical = command_for("full-cuda", (1080, 1920, "h264", "yuv420p"))
+        self.assertEqual(vertical[vertical.index("-vf") + 1], "scale_cuda=608:1080:format=nv12")
+        small = command_for("full-cuda", (1280, 720, "h264", "yuv420p"))
+        self.assertEqual(small[small.index("-vf") + 1], "scale_cuda=format=nv12")
+
+if __name__ == "__main__":
+    unittest.main()
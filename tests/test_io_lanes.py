@@ -0,0 +1,36 @@
+import os
+import queue
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from io_lanes import DeviceLanes, READ, WRITE
+
+INPUT_LANE = (READ, "disk")
+JOB_LANES = frozenset((INPUT_LANE, (WRITE, "out")))
+
+class BackgroundLaneTests(unittest.TestCase):
+    def setUp(self):
+        self.lanes = DeviceLanes(overrides={})
+        self.stop_event = threading.Event()
+        self.jobs = queue.Queue()
+
+    def test_job_is_not_blocked_by_background_work(self):
+        interrupt = self.lanes.acquire_idle(frozenset((INPUT_LANE,)), self.stop_event)
+        self.jobs.put("job")
+        taken = self.lanes.take(self.jobs, lambda job: JOB_LANES, self.stop_event, timeout=0.1)
+        self.assertEqual(taken, ("job", JOB_LANES))
+        self.assertTrue(interrupt.is_set())
+
+    def test_background_waits_for_running_job(self):
+        self.lanes._acquire(JOB_LANES)
+        stop_event = threading.Event()
+        threading.Timer(0.3, stop_event.set).start()
+        self.assertIsNone(self.lanes.acquire_idle(frozenset((INPUT_LANE,)), stop_event))
+        self.lanes.release(JOB_LANES)
+        self.assertIsNotNone(self.lanes.acquire_idle(frozenset((INPUT_LANE,)), self.stop_event))
+
+if __name__ == "__main__":
+    unittest.main()
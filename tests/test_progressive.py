@@ -0,0 +1,59 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from progressive import get_output_path, existing_outputs, remove_output
+
+# Cleanup after a failed encode must only ever remove what that job wrote.
+
+class RemoveOutputTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(prefix="mediaremux_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def touch(self, *parts):
+        path = os.path.join(self.folder, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("x")
+        return path
+
+    def test_new_file_is_removed(self):
+        output_path = get_output_path(self.folder, "clip_transcoded", "mp4", "file")
+        existing = existing_outputs(output_path)
+        self.touch("clip_transcoded.mp4")
+        remove_output(output_path, existing)
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_pre_existing_file_is_kept(self):
+        output_path = self.touch("clip_transcoded.mp4")
+        existing = existing_outputs(output_path)
+        self.assertIn(output_path, existing)
+        remove_output(output_path, existing)
+        self.assertTrue(os.path.exists(output_path))
+
+    def test_new_hls_folder_is_removed(self):
+        output_path = get_output_path(self.folder, "clip_transcoded", "mp4", "hls")
+        existing = existing_outputs(output_path)
+        self.touch("clip_transcoded_hls", "index.m3u8")
+        self.touch("clip_transcoded_hls", "seg_00000.m4s")
+        remove_output(output_path, existing)
+        self.assertFalse(os.path.exists(os.path.dirname(output_path)))
+
+    def test_pre_existing_hls_folder_keeps_other_files(self):
+        output_path = get_output_path(self.folder, "clip_transcoded", "mp4", "hls")
+        notes = self.touch("clip_transcoded_hls", "notes.txt")
+        existing = existing_outputs(output_path)
+        self.touch("clip_transcoded_hls", "index.m3u8")
+        self.touch("clip_transcoded_hls", "seg_00000.m4s")
+        remove_output(output_path, existing)
+        self.assertEqual(os.listdir(os.path.dirname(output_path)), [os.path.basename(notes)])
+
+if __name__ == "__main__":
+    unittest.main()
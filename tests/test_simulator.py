@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import simulator
+except ImportError:  # main.py needs Tk and tkinterdnd2
+    simulator = None
+
+# Small batches through the real worker code with the fake ffmpeg; durations
+# are short and time is compressed, so each run takes well under a second.
+
+@unittest.skipIf(simulator is None, "simulator needs main.py's GUI dependencies")
+class SimulatorTests(unittest.TestCase):
+    def run_jobs(self, jobs, **config):
+        return simulator.run_simulation({"time_scale": 0.0005, "jobs": jobs, **config})
+
+    def rows(self, report):
+        return {row["name"]: row for row in report["jobs"]}
+
+    def test_jobs_on_one_disk_take_turns_and_other_disks_run_alongside(self):
+        report = self.run_jobs([
+            {"name": "raid1.mp4", "device": "raid", "duration": 60},
+            {"name": "raid2.mp4", "device": "raid", "duration": 60, "arrival": 0.5},
+            {"name": "nvme.mp4", "device": "nvme", "duration": 60, "arrival": 1},
+        ], workers=2, device_limit=1)
+        rows = self.rows(report)
+        self.assertEqual(report["failed"], 0)
+        # raid2 waits for raid1's read lane; nvme starts without waiting for either
+        self.assertGreater(rows["raid2.mp4"]["wait"], 10)
+        self.assertLess(rows["nvme.mp4"]["wait"], 5)
+        self.assertLess(rows["nvme.mp4"]["finished"], rows["raid2.mp4"]["finished"])
+
+    def test_failed_encode_is_reported(self):
+        report = self.run_jobs([
+            {"name": "ok.mp4", "duration": 30},
+            {"name": "broken.mp4", "duration": 30, "fail": True},
+        ], workers=1)
+        rows = self.rows(report)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(rows["ok.mp4"]["status"], "ok")
+        self.assertTrue(rows["broken.mp4"]["status"].startswith("Error:"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+# ======== Chrome Trace Recording ========
+#
+# Spans are recorded as Chrome trace "complete" events (ph="X") and written as
+# a JSON object that chrome://tracing and ui.perfetto.dev open directly. Each
+# worker thread gets its own track, so idle gaps and overlap between parallel
+# workers are visible at a glance.
+
+class Tracer:
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self.named_threads = set()
+        self.tracks = {}
+        self.lock = threading.Lock()
+        # Workers flush concurrently; one writer at a time owns the temp file
+        self.write_lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def now(self):
+        return time.perf_counter()
+
+    def _micros(self, t):
+        return round((t - self.origin) * 1_000_000, 1)
+
+    def _thread_track(self, track=None):
+        # Spans land on the calling thread's track unless a named track is
+        # given (e.g. "queue"), which gets a synthetic tid of its own
+        if track is None:
+            thread = threading.current_thread()
+            tid, label = thread.ident, thread.name
+        else:
+            tid, label = self.tracks.setdefault(track, len(self.tracks) + 1), track
+        if tid not in self.named_threads:
+            self.named_threads.add(tid)
+            self.events.append({
+                "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+                "args": {"name": label}
+            })
+        return tid
+
+    def add_span(self, name, start, end, category="job", track=None, **args):
+        """Records a span between two perf_counter() timestamps on the current thread."""
+        with self.lock:
+            tid = self._thread_track(track)
+            self.events.append({
+                "name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": tid,
+                "ts": self._micros(start), "dur": round((end - start) * 1_000_000, 1),
+                "args": args
+            })
+
+    def add_instant(self, name, category="job", **args):
+        with self.lock:
+            tid = self._thread_track()
+            self.events.append({
+                "name": name, "cat": category, "ph": "i", "s": "t", "pid": self.pid, "tid": tid,
+                "ts": self._micros(self.now()), "args": args
+            })
+
+    @contextmanager
+    def span(self, name, category="job", **args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, self.now(), category, **args)
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        # Snapshot under the write lock too, so an older snapshot can never
+        # replace a newer one written by another worker in between
+        with self.write_lock:
+            with self.lock:
+                data = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+
+# Module-level tracer so helpers without access to the app (ffprobe calls,
+# worker loops) can record spans. None means tracing is off.
+_tracer = None
+
+def start_tracing(path):
+    global _tracer
+    _tracer = Tracer(path)
+    return _tracer
+
+def get_tracer():
+    return _tracer
+
+def span(name, category="job", **args):
+    """Context manager recording a span when tracing is enabled, otherwise a no-op."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, category, **args)
+
+def now():
+    return time.perf_counter()
+
+def add_span(name, start, end, category="job", track=None, **args):
+    if _tracer is not None:
+        _tracer.add_span(name, start, end, category, track, **args)
+
+def add_instant(name, category="job", **args):
+    if _tracer is not None:
+        _tracer.add_instant(name, category, **args)
+
+def flush():
+    """Writes the trace file so far; safe to call repeatedly."""
+    if _tracer is not None:
+        try:
+            _tracer.write()
+        except OSError as e:
+            print(f"Failed to write trace {_tracer.path}: {e}")
@@ -0,0 +1,117 @@
+import os
+import json
+import subprocess
+
+import tracing
+from resources import launch_ffmpeg
+from progressive import output_size
+
+# ======== Output Verification ========
+#
+# A zero ffmpeg exit code doesn't prove the output is whole, especially on
+# network shares. Verification is tiered by cost:
+#   container - ffprobe the output: duration, stream counts and size sanity
+#               against the input (reads only headers/index)
+#   sampled   - container, plus decode a few frames at several seek points,
+#               including one near the end to catch truncation
+#   full      - container, plus decode the whole output
+
+VERIFY_LEVELS = ("none", "container", "sampled", "full")
+DEFAULT_VERIFY_LEVEL = "container"
+
+# Allowed duration drift between input and output
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.01
+# Output average bitrate outside this range is treated as a broken file
+MIN_OUTPUT_BPS = 50_000
+MAX_SIZE_RATIO = 20
+SAMPLE_POINTS = 3
+SAMPLE_FRAMES = 5
+
+class VerificationError(Exception):
+    pass
+
+def probe_streams(path):
+    """Returns duration, size and video/audio stream counts for a media file."""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration:stream=codec_type",
+         "-of", "json", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise VerificationError(f"ffprobe could not read {os.path.basename(path)}: {result.stderr.decode(errors='replace').strip()}")
+    info = json.loads(result.stdout)
+    codec_types = [stream.get("codec_type") for stream in info.get("streams", [])]
+    return {
+        "duration": float(info.get("format", {}).get("duration", 0) or 0),
+        "size": output_size(path),
+        "video_streams": codec_types.count("video"),
+        "audio_streams": codec_types.count("audio"),
+    }
+
+def check_container(input_info, output_info):
+    """Cheap header-level checks of the output against the probed input."""
+    if output_info["size"] == 0:
+        raise VerificationError("output file is empty")
+    if output_info["video_streams"] != input_info["video_streams"]:
+        raise VerificationError(f"expected {input_info['video_streams']} video stream(s), found {output_info['video_streams']}")
+    if output_info["audio_streams"] != input_info["audio_streams"]:
+        raise VerificationError(f"expected {input_info['audio_streams']} audio stream(s), found {output_info['audio_streams']}")
+
+    expected, actual = input_info["duration"], output_info["duration"]
+    if expected > 0:
+        tolerance = max(DURATION_TOLERANCE_SECONDS, expected * DURATION_TOLERANCE_RATIO)
+        if abs(expected - actual) > tolerance:
+            raise VerificationError(f"duration {actual:.1f}s does not match input {expected:.1f}s")
+        if output_info["size"] * 8 / expected < MIN_OUTPUT_BPS:
+            raise VerificationError(f"output is implausibly small ({output_info['size']} bytes)")
+    if input_info["size"] and output_info["size"] > input_info["size"] * MAX_SIZE_RATIO:
+        raise VerificationError(f"output is {output_info['size'] / input_info['size']:.1f}x the input size")
+
+def run_decode(output_path, resource_class, seek=None, frames=None):
+    command = ["ffmpeg", "-v", "error", "-xerror"]
+    if seek is not None:
+        command.extend(["-ss", f"{seek:.3f}"])
+    command.extend(["-i", output_path])
+    if frames is not None:
+        command.extend(["-frames:v", str(frames)])
+    command.extend(["-f", "null", "-"])
+    process, _ = launch_ffmpeg(command, resource_class, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, stderr = process.communicate()
+    errors = stderr.decode(errors="replace").strip()
+    if process.returncode != 0 or errors:
+        where = f" at {seek:.1f}s" if seek is not None else ""
+        raise VerificationError(f"decode failed{where}: {errors[-300:] or f'exit code {process.returncode}'}")
+
+def seek_points(duration, count=SAMPLE_POINTS):
+    """Evenly spread seek points, always including one just before the end."""
+    if duration <= 0:
+        return [0.0]
+    points = [duration * i / count for i in range(count)]
+    points.append(max(duration - 2.0, 0.0))
+    return points
+
+def verify_output(input_path, output_path, level, resource_class):
+    """Verifies output_path up to the given level, raising VerificationError on failure.
+
+    Returns the list of checks that passed, for the job status.
+    """
+    if level == "none":
+        return []
+    name = os.path.basename(input_path)
+    with tracing.span("verify_container", "verify", file=name):
+        input_info = probe_streams(input_path)
+        output_info = probe_streams(output_path)
+        check_container(input_info, output_info)
+    passed = ["container"]
+
+    if level == "sampled":
+        with tracing.span("verify_sampled", "verify", file=name):
+            for point in seek_points(output_info["duration"]):
+                run_decode(output_path, resource_class, seek=point, frames=SAMPLE_FRAMES)
+        passed.append("sampled")
+    elif level == "full":
+        with tracing.span("verify_full", "verify", file=name):
+            run_decode(output_path, resource_class)
+        passed.append("full")
+    return passed